@@ -1,44 +1,90 @@
-from flask import Flask
+import os
+
+import click
 from dotenv import load_dotenv
-from flask_migrate import Migrate
-from app.database import db
+from flask import Flask
+from flask.cli import with_appcontext
+
+from app.assets import assets, assets_command
+from app.config import CONFIGS, from_env
+from app.cache import cache
+from app.database import db, init_db, create_db, sync_replicas_command
+from app.decorators import csrf
 from app.error_handlers import register_error_handlers
-from app.event.views import event, EventListView, EventDetailView
-from app.main.views import main
-from app.user.views import user, UserListView, UserDetailView
+from app.metrics import metrics
+from app.ratelimit import limiter
+from app.scheduler import scheduler
+from app.serializers import init_json
+from app.sessions import sessions, sweep_sessions_command
+from app.tokens import tokens
+
+
+def create_app(config=None):
+    """
+    Application factory
+    :param config: config class/object, name from app.config.CONFIGS or None
+                   (APP_CONFIG environment variable, 'development' by default).
+                   Environment variables override named configs.
+    :return: Flask app
+    """
+    app = Flask(__name__)
+    if config is None or isinstance(config, str):
+        load_dotenv()
+        app.config.from_object(CONFIGS[config or os.getenv('APP_CONFIG', 'development')])
+        app.config.from_mapping(from_env())
+    else:
+        app.config.from_object(config)
+
+    init_json(app)
+    # Database connection
+    init_db(app)
+    # Flask-Migrate pulls in alembic, only needed by `flask db ...` commands
+    if app.config['MIGRATIONS'] or click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    cache.init_app(app)
+    tokens.init_app(app)
+    metrics.init_app(app)
+    limiter.init_app(app)
+    sessions.init_app(app)
+    assets.init_app(app)
+    csrf.init_app(app)
+
+    # Blueprints registration (imported here, so importing the package stays cheap)
+    from app.event.jobs import expire_events_command, archive_events_command
+    from app.event.views import event, EventListView, EventDetailView
+    from app.main.views import main
+    from app.user.views import user, UserListView, UserDetailView
+    app.register_blueprint(event)
+    app.register_blueprint(user)
+    app.register_blueprint(main)
+
+    # Class-based rules for task 40
+    app.add_url_rule('/class/users/', view_func=UserListView.as_view('user_list'))
+    app.add_url_rule('/class/users/<int:id>/', view_func=UserDetailView.as_view('user_detail'))
+    app.add_url_rule('/class/events/', view_func=EventListView.as_view('event_list'))
+    app.add_url_rule('/class/events/<int:id>/', view_func=EventDetailView.as_view('event_detail'))
+    # Error handlers
+    register_error_handlers(app)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(sync_replicas_command)
+    app.cli.add_command(sweep_sessions_command)
+    app.cli.add_command(expire_events_command)
+    app.cli.add_command(archive_events_command)
+    app.cli.add_command(assets_command)
+    scheduler.init_app(app)
+
+    if app.config['AUTO_CREATE_DB']:
+        with app.app_context():
+            create_db()
+    return app
 
-import os
 
-app = Flask(__name__)
-load_dotenv()
-DEBUG = os.getenv('DEBUG') == 'True'
-SECRET_KEY = os.getenv('SECRET_KEY')
-PORT = int(os.getenv('PORT'))
-DATABASE = os.getenv('DATABASE')
-WTF_CSRF_ENABLED = os.getenv('WTF_CSRF_ENABLED')
-
-app.config['SECRET_KEY'] = SECRET_KEY
-app.config['DEBUG'] = DEBUG
-app.config['PORT'] = PORT
-app.config['WTF_CSRF_ENABLED'] = False
-
-# Database connection
-app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE
-db.init_app(app)
-migrate = Migrate(app, db)
-with app.app_context():
-    db.create_all()
-
-# Blueprints registration
-app.register_blueprint(event)
-app.register_blueprint(user)
-app.register_blueprint(main)
-
-# Class-based rules for task 40
-app.add_url_rule('/class/users/', view_func=UserListView.as_view('user_list'))
-app.add_url_rule('/class/users/<int:id>/', view_func=UserDetailView.as_view('user_detail'))
-app.add_url_rule('/class/events/', view_func=EventListView.as_view('event_list'))
-app.add_url_rule('/class/events/<int:id>/', view_func=EventDetailView.as_view('event_detail'))
-# Error handlers
-register_error_handlers(app)
-print(app.config.get('DEBUG'))
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """
+    Create missing tables (and the search index), stamp a new database with the newest migration
+    """
+    create_db()
+    click.echo('Database initialized.')
@@ -0,0 +1,212 @@
+import hashlib
+import io
+import time
+from functools import partial
+
+import sqlalchemy
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+from werkzeug.wrappers import Request
+
+from app import create_app
+from app.assets import compress_response
+from app.cache import cache, request_key
+from app.database import db, engine_options, apply_sqlite_pragmas
+from app.decorators import bearer_token
+from app.error_handlers import InvalidArgument
+from app.event import async_views
+from app.metrics import metrics
+from app.tokens import tokens, TokenError
+
+# ASGI mode (`uvicorn asgi:application`).
+# The polled JSON API reads run as coroutines on an async SQLAlchemy session,
+# so a waiting DB round trip doesn't hold a worker; every other request
+# (HTML pages, writes) is handed to the Flask app on a thread pool.
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+# path -> (handler, cache tags); the tags are the same as on the sync views
+ROUTES = Map([
+    Rule('/api/events/', endpoint=(async_views.get_events, ('event',))),
+    Rule('/api/users/', endpoint=(async_views.get_users, ('user',))),
+    Rule('/api/events/<int:id>/users/', endpoint=(async_views.get_event_users, ('event_user', 'user'))),
+])
+
+
+class AsyncDatabase:
+    """
+    Async engine and session factory for the database of `db`
+    (init with `async_db.init_app(app)`). ASYNC_DATABASE_URI overrides
+    the URI derived from SQLALCHEMY_DATABASE_URI.
+    """
+
+    def __init__(self):
+        self.engine = None
+        self.session = None
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_DATABASE_URI', None)
+        url = app.config['ASYNC_DATABASE_URI']
+        if url is None:
+            # the sync engine URL has relative SQLite paths resolved to the instance folder
+            with app.app_context():
+                url = db.engine.url
+            url = url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+        self.engine = create_async_engine(url, **engine_options(app.config))
+        pragmas = app.config['SQLITE_PRAGMAS']
+        if pragmas and self.engine.dialect.name == 'sqlite':
+            sqlalchemy.event.listen(self.engine.sync_engine, 'connect', partial(apply_sqlite_pragmas, pragmas))
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+        app.extensions['async_db'] = self
+
+
+async_db = AsyncDatabase()
+
+
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    """
+    asgiref runs every WSGI call on one shared thread (thread_sensitive);
+    Flask requests are independent, so each one gets a thread of the pool
+    """
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+class AsyncAPI:
+    """
+    ASGI application: ROUTES are served by async handlers, everything else by the Flask app
+    """
+
+    def __init__(self, app, database=None):
+        self.app = app
+        self.wsgi = ThreadedWsgiToAsgi(app)
+        self.database = database or async_db
+        self.routes = ROUTES.bind('localhost')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            try:
+                (handler, tags), kwargs = self.routes.match(scope['path'], method='GET')
+            except HTTPException:
+                pass
+            else:
+                request = Request(_environ(scope))
+                response = await self._dispatch(handler, tags, request, kwargs)
+                return await _send_response(response, scope, send)
+        await self.wsgi(scope, receive, send)
+
+    async def _dispatch(self, handler, tags, request, kwargs):
+        start = time.perf_counter()
+        with self.app.app_context():
+            response = await self._respond(handler, tags, request, kwargs)
+            if self.app.config['COMPRESS_ENABLED']:
+                compress_response(response, request.accept_encodings, self.app.config)
+            if 'metrics' in self.app.extensions:
+                labels = {'endpoint': f'async.{handler.__name__}', 'method': request.method}
+                metrics.registry.inc('http_requests_total', {**labels, 'status': response.status_code})
+                metrics.registry.observe('http_request_duration_seconds', labels, time.perf_counter() - start)
+        return response
+
+    async def _respond(self, handler, tags, request, kwargs):
+        """
+        token_required + cached(per_user=False) + the handler, as on the sync views
+        """
+        token = bearer_token(request.headers.get('Authorization'))
+        if not token:
+            return self._json_error('Token is missing!', 401)
+        try:
+            tokens.verify(token)
+        except TokenError as exc:
+            return self._json_error(str(exc), 401)
+        key = cache.make_key(request_key(request.path, request.args), tags)
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                async with self.database.session() as session:
+                    payload = await handler(session, request, **kwargs)
+            except InvalidArgument as exc:
+                response = self.app.json.response(exc.errors())
+                response.status_code = 400
+                return response
+            except HTTPException as exc:
+                return exc.get_response()
+            response = self.app.json.response(payload)
+            body = response.get_data()
+            etag = hashlib.sha1(body).hexdigest()
+            cache.set(key, (body, response.mimetype, etag))
+        else:
+            body, mimetype, etag = entry
+            response = self.app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    def _json_error(self, message, status):
+        response = self.app.json.response({'message': message})
+        response.status_code = status
+        return response
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.database.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def _environ(scope):
+    """
+    WSGI environ of a bodiless HTTP request scope, enough for werkzeug's Request
+    """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin1')
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+async def _send_response(response, scope, send):
+    headers = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.headers.items()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    body = b'' if scope['method'] == 'HEAD' else response.get_data()
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def create_asgi_app(config=None):
+    """
+    ASGI application factory
+    :param config: same as for create_app
+    :return: AsyncAPI
+    """
+    app = create_app(config)
+    async_db.init_app(app)
+    return AsyncAPI(app)
@@ -0,0 +1,224 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response compression and fingerprinted static files.
+# Responses of COMPRESS_MIMETYPES of at least COMPRESS_MIN_SIZE bytes are
+# compressed with the best encoding the client accepts (brotli when the
+# `brotli` package is installed, gzip otherwise).
+# `flask assets build` copies every static file to ASSETS_DIR under a name
+# carrying a hash of its content, precompressed, and writes a manifest;
+# url_for('static', ...) then points to the hashed copies, which are served
+# with an immutable Cache-Control, so browsers never revalidate them.
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+MANIFEST = 'manifest.json'
+
+
+def compress(data, encoding, level):
+    """
+    :param data: bytes
+    :param encoding: 'br' or 'gzip'
+    :param level: brotli quality (0-11) or gzip level (1-9)
+    :return: bytes
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    # mtime=0: the same body always compresses to the same bytes
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_response(response, accept_encodings, config):
+    """
+    Compress a response body in place if the client accepts it and it is worth it
+    :param response: Response
+    :param accept_encodings: werkzeug Accept of the request's Accept-Encoding
+    :param config: app config
+    :return: response
+    """
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in config['COMPRESS_MIMETYPES']
+            or 'Content-Encoding' in response.headers or response.cache_control.no_transform):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+    encoding = accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+    level = config['COMPRESS_BROTLI_QUALITY'] if encoding == 'br' else config['COMPRESS_GZIP_LEVEL']
+    response.set_data(compress(data, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    # the compressed body is another representation: a strong ETag must not match both
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def fingerprint(path, data):
+    """
+    :param path: static file path, e.g. 'css/styles.css'
+    :param data: file content
+    :return: path with a hash of the content, e.g. 'css/styles.3f2a9c1b7d0e.css'
+    """
+    root, ext = os.path.splitext(path)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def build(static_folder, output, config, clean=False):
+    """
+    Copy the static files to `output` under fingerprinted names, precompress
+    the compressible ones (at the highest levels) and write the manifest.
+    Older builds are kept, so pages rendered before a deploy still find their files.
+    :param static_folder: static folder path
+    :param output: build folder name inside the static folder
+    :param config: app config (COMPRESS_MIMETYPES, COMPRESS_MIN_SIZE)
+    :param clean: delete the build folder first
+    :return: manifest dict (path -> fingerprinted path, both relative to the static folder)
+    """
+    output_folder = os.path.join(static_folder, output)
+    if clean:
+        shutil.rmtree(output_folder, ignore_errors=True)
+    manifest = {}
+    for folder, folders, files in os.walk(static_folder):
+        if os.path.abspath(folder) == os.path.abspath(static_folder) and output in folders:
+            folders.remove(output)
+        for name in sorted(files):
+            path = os.path.relpath(os.path.join(folder, name), static_folder).replace(os.sep, '/')
+            with open(os.path.join(folder, name), 'rb') as f:
+                data = f.read()
+            target = f'{output}/{fingerprint(path, data)}'
+            os.makedirs(os.path.dirname(os.path.join(static_folder, target)), exist_ok=True)
+            _write(os.path.join(static_folder, target), data)
+            mimetype = mimetypes.guess_type(name)[0]
+            if mimetype in config['COMPRESS_MIMETYPES'] and len(data) >= config['COMPRESS_MIN_SIZE']:
+                for encoding in ENCODINGS:
+                    compressed = compress(data, encoding, 11 if encoding == 'br' else 9)
+                    if len(compressed) < len(data):
+                        _write(os.path.join(static_folder, target + SUFFIXES[encoding]), compressed)
+            manifest[path] = target
+    os.makedirs(output_folder, exist_ok=True)
+    _write(os.path.join(output_folder, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def _write(path, data):
+    # write and rename: a worker serving the build never reads a partial file
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+class Assets:
+    """
+    Response compression and fingerprinted static files (init with `assets.init_app(app)`)
+    """
+
+    def __init__(self):
+        self.manifest = {}
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        app.config.setdefault('COMPRESS_MIMETYPES', (
+            'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+            'application/json', 'image/svg+xml',
+        ))
+        # build folder inside the static folder; use its manifest for static URLs
+        app.config.setdefault('ASSETS_DIR', 'dist')
+        app.config.setdefault('ASSETS_MANIFEST', True)
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        if app.config['COMPRESS_ENABLED']:
+            app.after_request(self._after_request)
+        if app.static_folder:
+            self.manifest = self.load_manifest(app) if app.config['ASSETS_MANIFEST'] else {}
+            app.url_defaults(self._static_url_defaults)
+            app.view_functions['static'] = self.send_static_file
+        app.extensions['assets'] = self
+
+    @staticmethod
+    def load_manifest(app):
+        """
+        Manifest of the last `flask assets build`
+        :return: dict, empty without a build
+        """
+        path = os.path.join(app.static_folder, app.config['ASSETS_DIR'], MANIFEST)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _static_url_defaults(self, endpoint, values):
+        if endpoint == 'static' and self.manifest:
+            path = self.manifest.get(values.get('filename'))
+            if path is not None:
+                values['filename'] = path
+
+    @staticmethod
+    def _after_request(response):
+        return compress_response(response, request.accept_encodings, current_app.config)
+
+    @staticmethod
+    def send_static_file(filename):
+        """
+        Static view: files of the build folder are cached forever and sent
+        precompressed when the client accepts it, others are Flask's static files
+        """
+        app = current_app
+        if not filename.startswith(app.config['ASSETS_DIR'] + '/'):
+            return app.send_static_file(filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encodings = [encoding for encoding in ENCODINGS
+                     if os.path.isfile(safe_join(app.static_folder, filename + SUFFIXES[encoding]) or '')]
+        encoding = request.accept_encodings.best_match(encodings) if encodings else None
+        path = filename + SUFFIXES[encoding] if encoding else filename
+        response = send_from_directory(app.static_folder, path, mimetype=mimetype,
+                                       max_age=app.config['ASSETS_MAX_AGE'])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
+
+
+@click.group('assets')
+def assets_command():
+    """
+    Static files
+    """
+
+
+@assets_command.command('build')
+@click.option('--clean', is_flag=True, help='Delete earlier builds first.')
+@with_appcontext
+def build_command(clean):
+    """
+    Fingerprint and precompress the static files
+    """
+    manifest = build(current_app.static_folder, current_app.config['ASSETS_DIR'], current_app.config, clean)
+    click.echo(f'Built {len(manifest)} static files into {current_app.config["ASSETS_DIR"]}/.')
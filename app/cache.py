@@ -0,0 +1,271 @@
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+import sqlalchemy
+from flask import request, session, make_response, current_app, g
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+
+
+class BaseCache:
+    """
+    Cache backend interface.
+    Shared backends (e.g. redis/memcached adapters) implement the same four methods;
+    values are plain tuples/str so they can be pickled.
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullCache(BaseCache):
+    """
+    Backend that stores nothing (CACHE_BACKEND = 'null')
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(BaseCache):
+    """
+    Thread-safe in-process LRU cache with per-entry TTL and a size bound
+    """
+
+    def __init__(self, max_size=1024, default_ttl=60):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_size=config['CACHE_MAX_SIZE'], default_ttl=config['CACHE_DEFAULT_TTL'])
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+BACKENDS = {
+    'memory': LRUCache,
+    'null': NullCache,
+}
+
+
+class Cache:
+    """
+    Cache extension (init with `cache.init_app(app)`).
+    Entries are tagged with table names; every tag has a version token stored
+    in the backend and included in the entry key, so invalidating a tag is a
+    single write and stale entries simply age out of the LRU.
+    """
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_MAX_SIZE', 1024)
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        backend = app.config['CACHE_BACKEND']
+        if isinstance(backend, str):
+            backend = BACKENDS.get(backend) or import_string(backend)
+        if isinstance(backend, type):
+            backend = backend.from_config(app.config)
+        self.backend = backend
+        app.extensions['cache'] = self
+
+    def tag_version(self, tag):
+        """
+        Current version token of a tag (a missing token is recreated, never reused)
+        :param tag: str
+        :return: str
+        """
+        key = f'tag:{tag}'
+        version = self.backend.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            self.backend.set(key, version, ttl=0)
+        return version
+
+    def invalidate(self, *tags):
+        """
+        Invalidate every entry stored with any of the tags
+        :param tags: str
+        :return:
+        """
+        for tag in tags:
+            self.backend.set(f'tag:{tag}', uuid.uuid4().hex, ttl=0)
+
+    def make_key(self, name, tags):
+        versions = ','.join(self.tag_version(tag) for tag in tags)
+        return f'{name}|{versions}'
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+
+cache = Cache()
+
+
+def request_key(path, args, user_id=None):
+    """
+    Cache key of a view response
+    :param path: request path
+    :param args: query arguments (MultiDict)
+    :param user_id: int or None for responses shared by all users
+    :return: str
+    """
+    args = '&'.join(f'{key}={value}' for key, value in sorted(args.items(multi=True)))
+    return f'view:{path}?{args}|user={user_id}'
+
+
+def _request_key(per_user):
+    user_id = None
+    if per_user:
+        # API user of the token (set by token_required) or the session user
+        user_id = g.get('current_user_id') or session.get('user_id')
+        if current_app.config['WTF_CSRF_ENABLED'] and not g.get('current_user_id'):
+            # forms of the page carry a token of the session's CSRF secret (created here if missing)
+            generate_csrf()
+            secret = session[current_app.config['WTF_CSRF_FIELD_NAME']]
+            user_id = f'{user_id}:{hashlib.sha1(secret.encode()).hexdigest()[:16]}'
+    return request_key(request.path, request.args, user_id)
+
+
+def cached(tags, ttl=None, per_user=True):
+    """
+    Decorator to cache GET responses (HTML or JSON) keyed by path, query args
+    and (optionally) logged in or token user; adds ETag and answers If-None-Match with 304.
+    Pages with pending flash messages are neither served from nor stored in the cache.
+    :param tags: table names the response depends on
+    :param ttl: seconds, CACHE_DEFAULT_TTL if None
+    :param per_user: include user id (token or session) into the key
+    :return:
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # a client reading its own writes from the primary (app.database) skips entries
+            # that other clients may have stored from a replica lagging behind
+            if request.method != 'GET' or '_flashes' in session or g.get('db_sticky'):
+                return f(*args, **kwargs)
+            key = cache.make_key(_request_key(per_user), tags)
+            entry = cache.get(key)
+            if entry is None:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                entry_ttl = ttl
+                if g.get('db_replica') is not None:
+                    # the replica may not have the write that changed the tag versions yet
+                    entry_ttl = min(ttl or current_app.config['CACHE_DEFAULT_TTL'],
+                                    current_app.config['DATABASE_REPLICA_LAG'])
+                cache.set(key, (body, response.mimetype, etag), entry_ttl)
+            else:
+                body, mimetype, etag = entry
+                response = current_app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
+
+
+# Invalidation: collect tables touched by flushes and bulk ORM statements
+# of a transaction and invalidate their tags once it is committed.
+def _collect_flushed_tables(session, flush_context):
+    tables = session.info.setdefault('cache_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            tables.add(table)
+
+
+def _collect_bulk_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault('cache_tags', set()).add(table.name)
+
+
+def _invalidate_committed(session):
+    tables = session.info.pop('cache_tags', None)
+    if tables and cache.backend is not None:
+        cache.invalidate(*tables)
+
+
+def _discard_rolled_back(session):
+    session.info.pop('cache_tags', None)
+
+
+sqlalchemy.event.listen(Session, 'after_flush', _collect_flushed_tables)
+sqlalchemy.event.listen(Session, 'do_orm_execute', _collect_bulk_tables)
+sqlalchemy.event.listen(Session, 'after_commit', _invalidate_committed)
+sqlalchemy.event.listen(Session, 'after_rollback', _discard_rolled_back)
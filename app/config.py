@@ -1,5 +1,133 @@
 # App config file
-SECRET_KEY = 'alsdALSD2345'
-DEBUG = True
-PORT = 5000
-WTF_CSRF_ENABLED = False
+import os
+
+
+class Config:
+    SECRET_KEY = None
+    DEBUG = False
+    TESTING = False
+    PORT = 5000
+    WTF_CSRF_ENABLED = False
+    # checked per view (FlaskForm.validate, app.decorators.csrf_required), not on every POST
+    WTF_CSRF_CHECK_DEFAULT = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///db.sqlite3'
+    # applied to every new SQLite connection, empty dict keeps SQLite defaults
+    # (WAL lets readers run while a worker writes, busy_timeout makes writers wait instead of failing)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 2 ** 20,
+        'temp_store': 'MEMORY',
+    }
+    # connection pool of server databases (PostgreSQL, MySQL), not used for SQLite
+    DATABASE_POOL_SIZE = 10
+    DATABASE_MAX_OVERFLOW = 20
+    DATABASE_POOL_RECYCLE = 1800
+    DATABASE_POOL_PRE_PING = True
+    # read replica URIs: SELECTs of GET requests go to a random one, the rest to the primary;
+    # seconds a replica may lag: a client reads from the primary this long after its writes
+    DATABASE_REPLICAS = []
+    DATABASE_REPLICA_LAG = 5
+    PASSWORD_HASH_METHOD = 'scrypt'
+    # create missing tables in create_app; otherwise use `flask init-db` or `flask db upgrade`
+    AUTO_CREATE_DB = False
+    # register Flask-Migrate outside of the flask command line (it is always registered there)
+    MIGRATIONS = False
+    # token buckets per limit name and request key: '<count>/<second|minute|hour|day>';
+    # keys are 'ip', 'ip_username' or 'username' (any address: lets others lock an account out)
+    RATELIMIT_ENABLED = True
+    RATELIMITS = {
+        'login': {'ip': '30/minute', 'ip_username': '10/minute'},
+    }
+    # 'memory' (per worker) or 'sqlite' (shared by the workers of one host, RATELIMIT_SQLITE_PATH)
+    RATELIMIT_STORE = 'memory'
+    # server-side sessions: 'sql' (user_session table), 'memory' (per worker) or 'cookie' (Flask's signed cookie)
+    SESSION_STORE = 'sql'
+    # revoked JWT ids: 'sql' (revoked_token table, shared by the workers) or 'memory' (per worker)
+    JWT_REVOCATION_STORE = 'sql'
+    SESSION_COOKIE_HTTPONLY = True
+    SESSION_COOKIE_SAMESITE = 'Lax'
+    # run periodic jobs (e.g. expire-events) in a thread of the app; one worker runs them
+    # (SCHEDULER_LOCK_PATH), otherwise run the CLI commands from cron
+    SCHEDULER_ENABLED = False
+    SCHEDULER_INTERVALS = {'expire-events': 3600, 'archive-events': 24 * 3600}
+    # archive-events moves deactivated events ended this many days ago (and their enrollments)
+    ARCHIVE_AFTER_DAYS = 365
+    # gzip/brotli responses of COMPRESS_MIMETYPES from COMPRESS_MIN_SIZE bytes
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500
+    # static URLs point to the fingerprinted files of `flask assets build` (cached forever)
+    ASSETS_MANIFEST = True
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    AUTO_CREATE_DB = True
+    # edited static files are served as they are, without a rebuild
+    ASSETS_MANIFEST = False
+
+
+class ProductionConfig(Config):
+    # /metrics is public without METRICS_TOKEN: enable explicitly
+    METRICS_ENABLED = False
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'testing'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    AUTO_CREATE_DB = True
+    RATELIMIT_ENABLED = False
+    SESSION_STORE = 'memory'
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+# environment variable -> (config key, converter)
+ENV_VARIABLES = {
+    'SECRET_KEY': ('SECRET_KEY', str),
+    'DEBUG': ('DEBUG', lambda value: value == 'True'),
+    'PORT': ('PORT', int),
+    'WTF_CSRF_ENABLED': ('WTF_CSRF_ENABLED', lambda value: value == 'True'),
+    'DATABASE': ('SQLALCHEMY_DATABASE_URI', str),
+    'PASSWORD_HASH_METHOD': ('PASSWORD_HASH_METHOD', str),
+    'DATABASE_POOL_SIZE': ('DATABASE_POOL_SIZE', int),
+    'DATABASE_MAX_OVERFLOW': ('DATABASE_MAX_OVERFLOW', int),
+    'DATABASE_POOL_RECYCLE': ('DATABASE_POOL_RECYCLE', int),
+    'DATABASE_POOL_PRE_PING': ('DATABASE_POOL_PRE_PING', lambda value: value == 'True'),
+    'DATABASE_REPLICAS': ('DATABASE_REPLICAS', lambda value: value.split(',')),
+    'DATABASE_REPLICA_LAG': ('DATABASE_REPLICA_LAG', float),
+    'METRICS_ENABLED': ('METRICS_ENABLED', lambda value: value == 'True'),
+    'METRICS_TOKEN': ('METRICS_TOKEN', str),
+    'PROFILE_SAMPLE_RATE': ('PROFILE_SAMPLE_RATE', float),
+    'PROFILE_SLOW_REQUEST_MS': ('PROFILE_SLOW_REQUEST_MS', int),
+    'CACHE_BACKEND': ('CACHE_BACKEND', str),
+    'ASYNC_DATABASE': ('ASYNC_DATABASE_URI', str),
+    'RATELIMIT_ENABLED': ('RATELIMIT_ENABLED', lambda value: value == 'True'),
+    'RATELIMIT_STORE': ('RATELIMIT_STORE', str),
+    'SESSION_STORE': ('SESSION_STORE', str),
+    'JWT_REVOCATION_STORE': ('JWT_REVOCATION_STORE', str),
+    'SCHEDULER_ENABLED': ('SCHEDULER_ENABLED', lambda value: value == 'True'),
+    'ARCHIVE_AFTER_DAYS': ('ARCHIVE_AFTER_DAYS', int),
+    'COMPRESS_ENABLED': ('COMPRESS_ENABLED', lambda value: value == 'True'),
+    'ASSETS_MANIFEST': ('ASSETS_MANIFEST', lambda value: value == 'True'),
+}
+
+
+def from_env():
+    """
+    Config values set by environment variables (and .env file)
+    :return: dict
+    """
+    values = {}
+    for variable, (key, convert) in ENV_VARIABLES.items():
+        value = os.getenv(variable)
+        if value is not None and value != '':
+            values[key] = convert(value)
+    return values
@@ -1,3 +1,196 @@
+import os
+import random
+import sqlite3
+import time
+from functools import partial
+
+import click
+import sqlalchemy
+from flask import current_app, g, request, has_request_context
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select
+from sqlalchemy.engine import make_url
+
+# Read replicas (DATABASE_REPLICAS): SELECTs of GET/HEAD requests go to a
+# random replica, everything else to the primary. A client that committed
+# a write gets a cookie keeping its reads on the primary for
+# DATABASE_REPLICA_LAG seconds (read-your-writes). Outside of requests
+# (CLI, scheduler) the session only uses the primary.
+
+REPLICA_BIND = 'replica_{}'
+STICKY_COOKIE = 'db_primary_until'
+
+
+class RoutingSession(Session):
+    """
+    Session sending SELECTs to session.info['replica'] when it is set, until
+    the first write of the session; writes, flushes and explicit binds use the primary
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None:
+            if (not self._flushing and isinstance(clause, Select) and clause._for_update_arg is None
+                    and not self.info.get('wrote')):
+                return replica
+            # stay on the primary for the rest of the session: later reads see the writes
+            self.info['wrote'] = True
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def engine_options(config):
+    """
+    Engine options for the configured database: pool settings for server
+    databases, SQLite keeps SQLAlchemy's default pool
+    :param config: app config
+    :return: dict for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite':
+        options.setdefault('pool_size', config['DATABASE_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DATABASE_MAX_OVERFLOW'])
+        options.setdefault('pool_recycle', config['DATABASE_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', config['DATABASE_POOL_PRE_PING'])
+    return options
+
+
+def apply_sqlite_pragmas(pragmas, dbapi_connection, connection_record):
+    """
+    Engine 'connect' hook: run PRAGMA statements on a new SQLite connection
+    :param pragmas: dict name -> value
+    :return:
+    """
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+def init_db(app):
+    """
+    Init SQLAlchemy with the engine profile from config
+    :param app: Flask app
+    :return:
+    """
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    app.config.setdefault('DATABASE_REPLICAS', [])
+    app.config.setdefault('DATABASE_REPLICA_LAG', 5)
+    replicas = app.config['DATABASE_REPLICAS']
+    if replicas:
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        for number, uri in enumerate(replicas):
+            binds[REPLICA_BIND.format(number)] = uri
+        app.before_request(_route_request)
+        app.after_request(_stick_to_primary)
+    db.init_app(app)
+    pragmas = app.config['SQLITE_PRAGMAS']
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                sqlalchemy.event.listen(engine, 'connect', partial(apply_sqlite_pragmas, pragmas))
+
+
+def replica_engines():
+    """
+    :return: list of the replica engines (empty without DATABASE_REPLICAS)
+    """
+    return [db.engines[REPLICA_BIND.format(number)]
+            for number in range(len(current_app.config['DATABASE_REPLICAS']))]
+
+
+def _route_request():
+    if request.method not in ('GET', 'HEAD'):
+        return
+    if request.cookies.get(STICKY_COOKIE, type=float, default=0) > time.time():
+        g.db_sticky = True
+        return
+    g.db_replica = random.choice(replica_engines())
+    db.session.info['replica'] = g.db_replica
+
+
+def _stick_to_primary(response):
+    if g.pop('db_committed_writes', False):
+        lag = current_app.config['DATABASE_REPLICA_LAG']
+        response.set_cookie(STICKY_COOKIE, str(time.time() + lag), max_age=lag,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+# writes committed during a request make the client read from the primary for a while
+@sqlalchemy.event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    session.info['pending_writes'] = True
+
+
+@sqlalchemy.event.listens_for(RoutingSession, 'do_orm_execute')
+def _after_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['pending_writes'] = True
+
+
+@sqlalchemy.event.listens_for(RoutingSession, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('pending_writes', False) and has_request_context():
+        g.db_committed_writes = True
+
+
+@sqlalchemy.event.listens_for(RoutingSession, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('pending_writes', None)
+
+
+def create_db():
+    """
+    Create missing tables (and the search index). A database created from
+    scratch is stamped with the newest migration, so `flask db upgrade`
+    doesn't replay migrations over tables that already have their changes.
+    :return:
+    """
+    fresh = not sqlalchemy.inspect(db.engine).get_table_names()
+    db.create_all()
+    if fresh:
+        # alembic is only imported here: workers on an existing database don't load it
+        from alembic.config import Config
+        from alembic.runtime.migration import MigrationContext
+        from alembic.script import ScriptDirectory
+        config = Config()
+        config.set_main_option('script_location', os.path.join(os.path.dirname(current_app.root_path), 'migrations'))
+        with db.engine.begin() as connection:
+            MigrationContext.configure(connection).stamp(ScriptDirectory.from_config(config), 'head')
+
+
+def sync_sqlite_replicas():
+    """
+    Copy the primary SQLite database to the SQLite replicas (online backup),
+    a stand-in for replication when trying replicas locally
+    :return: number of replicas copied
+    """
+    primary = db.engine.url.database
+    copied = 0
+    for engine in replica_engines():
+        if engine.dialect.name != 'sqlite' or db.engine.dialect.name != 'sqlite':
+            continue
+        source, target = sqlite3.connect(primary), sqlite3.connect(engine.url.database)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        copied += 1
+    return copied
+
 
-db = SQLAlchemy()
+@click.command('sync-replicas')
+@with_appcontext
+def sync_replicas_command():
+    """
+    Copy the SQLite primary to the SQLite replicas (local testing)
+    """
+    click.echo(f'Copied the primary to {sync_sqlite_replicas()} replicas.')
@@ -1,3 +1,22 @@
+from flask import request
+from werkzeug.exceptions import BadRequest
+
+
+class InvalidArgument(BadRequest):
+    """
+    Malformed query argument: the usual 400 page, on the JSON API
+    `{'errors': {argument: [message]}}` like the per-item errors of bulk requests
+    """
+
+    def __init__(self, argument, message):
+        super().__init__(message)
+        self.argument = argument
+        self.message = message
+
+    def errors(self):
+        return {'errors': {self.argument: [self.message]}}
+
+
 def register_error_handlers(app):
     # Error 404 customization
     @app.errorhandler(404)
@@ -8,3 +27,17 @@ def register_error_handlers(app):
     @app.errorhandler(500)
     def page_not_found(_):
         return "<h1>My bad...</h1>", 500
+
+    # Error 429 customization (rate limits), keeps Retry-After
+    @app.errorhandler(429)
+    def too_many_requests(e):
+        headers = {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+        if request.is_json:
+            return {'message': 'Too many requests'}, 429, headers
+        return "<h1>Too many attempts, try again later</h1>", 429, headers
+
+    @app.errorhandler(InvalidArgument)
+    def invalid_argument(e):
+        if request.path.startswith('/api/'):
+            return e.errors(), 400
+        return e.get_response()
@@ -0,0 +1,66 @@
+import math
+
+from app.event import calendar
+from app.event.models import Event
+from app.event.queries import select_event_users_detail
+from app.event.serializers import EVENT, EVENT_USER
+from app.pagination import (is_keyset_request, keyset_args, keyset_paginate_async, request_offset_window,
+                            invalid_cursor)
+from app.user.models import User
+from app.user.serializers import USER
+
+# Async versions of the polled read endpoints of the JSON API, served by
+# app.asgi.AsyncAPI with an AsyncSession. They run the same queries and
+# return the same JSON as their sync twins in app.event.views.
+# Each handler takes (session, request, **url arguments) and returns the
+# JSON payload; routes and cache tags are in app.asgi.ROUTES.
+
+
+async def _list(session, request, serializer, keys, restrict=None):
+    """
+    Async views.api_list
+    :return: JSON payload
+    """
+    fields = serializer.request_fields(request.args)
+    query = serializer.select(fields, required=tuple(key.key for key in keys))
+    if restrict is not None:
+        query = restrict(query)
+    if is_keyset_request(request.args):
+        try:
+            page = await keyset_paginate_async(session, query, keys, **keyset_args(request.args))
+        except ValueError as exc:
+            raise invalid_cursor(exc, request.args)
+        return page.to_dict(serializer.dump(page, fields))
+    offset, limit = request_offset_window(request.args)
+    return serializer.dump(await session.execute(query.order_by(*keys).offset(offset).limit(limit)), fields)
+
+
+async def get_events(session, request):
+    """
+    Async twin of views.get_events_by_api
+    """
+    date_range = calendar.request_range(request.args)
+    if date_range is None:
+        return await _list(session, request, EVENT, [Event.id])
+    longest = await session.scalar(calendar.select_longest_days(session.bind.dialect.name))
+    longest = math.ceil(longest or 0)
+    return await _list(session, request, EVENT, calendar.CALENDAR_KEYS,
+                       lambda query: calendar.overlapping(query, *date_range, longest=longest))
+
+
+async def get_users(session, request):
+    """
+    Async twin of views.get_users_by_api
+    """
+    return await _list(session, request, USER, [User.id])
+
+
+async def get_event_users(session, request, id):
+    """
+    Async twin of views.api_get_users_by_event_id
+    """
+    fields = EVENT_USER.request_fields(request.args)
+    rows = (await session.execute(select_event_users_detail(id, fields))).all()
+    if not rows:
+        rows = (await session.execute(select_event_users_detail(id, fields, archived=True))).all()
+    return EVENT_USER.dump(rows, fields)
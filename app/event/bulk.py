@@ -0,0 +1,326 @@
+import datetime
+
+from sqlalchemy import insert, update, delete, func
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app.event import leaderboard
+from app.event.forms import EventForm
+from app.event.models import Event, EventUser, ArchivedEvent, ArchivedEventUser
+from app.event.services import reserve_place, EnrollmentError
+from app.user.forms import UserForm
+from app.user.models import User, hash_password
+
+# Batch writes for the JSON API.
+# Every item is validated with the same form as the HTML views, the valid
+# ones are written with a single executemany per table and the caller
+# commits once, so a batch of any size is one transaction.
+# Each function returns per-item results: {'index', 'status', 'id' | 'errors'}.
+
+EVENT_FIELDS = ('description', 'begin_at', 'end_at', 'max_users', 'is_active')
+USER_FIELDS = ('first_name', 'last_name', 'username', 'password')
+IN_CHUNK_SIZE = 500
+
+
+def as_items(payload):
+    """
+    Normalize JSON body (object or array of objects) to a list
+    :param payload: parsed JSON
+    :return: (list of dict, bool: payload was an array)
+    :raise ValueError: unsupported payload
+    """
+    many = isinstance(payload, list)
+    items = payload if many else [payload]
+    if not items or not all(isinstance(item, dict) for item in items):
+        raise ValueError('Expected an object or a non-empty array of objects')
+    return items, many
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), IN_CHUNK_SIZE):
+        yield values[start:start + IN_CHUNK_SIZE]
+
+
+def _result(index, status, **extra):
+    return {'index': index, 'status': status, **extra}
+
+
+def _validate(form_class, fields, data):
+    """
+    Validate one item with a form (no CSRF, JSON values as form data)
+    :return: (cleaned data or None, errors or None)
+    """
+    values = MultiDict({key: value.isoformat() if isinstance(value, datetime.date) else value
+                        for key, value in data.items() if value is not None})
+    form = form_class(formdata=values, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    return {name: form[name].data for name in fields}, None
+
+
+def _parse_id(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError
+    return value
+
+
+def _insert(model, rows):
+    if not rows:
+        return []
+    query = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return db.session.execute(query, rows).scalars().all()
+
+
+def _select_in(columns, key, values):
+    """
+    Rows of `columns` where `key` is in `values`, queried in chunks
+    """
+    rows = []
+    for chunk in _chunks(values):
+        rows.extend(db.session.execute(db.select(*columns).where(key.in_(chunk))).all())
+    return rows
+
+
+def max_users_error(participants):
+    """
+    :param participants: participants_count of the event
+    :return: error message for a max_users below it
+    """
+    return f'Max users can not be below the number of participants ({participants}).'
+
+
+def create_events(items, created_by):
+    """
+    :param items: list of dict with EventForm fields
+    :param created_by: user id
+    :return: list of results
+    """
+    results, rows, indexes = [], [], []
+    for index, item in enumerate(items):
+        data, errors = _validate(EventForm, EVENT_FIELDS, {'is_active': True, **item})
+        if errors:
+            results.append(_result(index, 400, errors=errors))
+            continue
+        rows.append({**data, 'created_by': created_by})
+        indexes.append(index)
+    results.extend(_result(index, 201, id=id) for index, id in zip(indexes, _insert(Event, rows)))
+    return sorted(results, key=lambda result: result['index'])
+
+
+def update_events(items):
+    """
+    Partial update: fields missing from an item keep their current values
+    :param items: list of dict with `id` and EventForm fields
+    :return: list of results
+    """
+    results, rows, pending = [], [], []
+    for index, item in enumerate(items):
+        try:
+            pending.append((index, _parse_id(item.get('id')), item))
+        except ValueError:
+            results.append(_result(index, 400, errors={'id': ['Integer id is required.']}))
+    columns = [Event.id, Event.participants_count] + [getattr(Event, name) for name in EVENT_FIELDS]
+    current = {row.id: row._asdict() for row in _select_in(columns, Event.id, {id for _, id, _ in pending})}
+    for index, id, item in pending:
+        if id not in current:
+            results.append(_result(index, 404, id=id))
+            continue
+        participants = current[id]['participants_count']
+        data, errors = _validate(EventForm, EVENT_FIELDS, {**current[id], **item})
+        if not errors and data['max_users'] < participants:
+            errors = {'max_users': [max_users_error(participants)]}
+        if errors:
+            results.append(_result(index, 400, id=id, errors=errors))
+            continue
+        rows.append({**data, 'id': id})
+        results.append(_result(index, 200, id=id))
+    if rows:
+        db.session.execute(update(Event), rows)
+    return sorted(results, key=lambda result: result['index'])
+
+
+def delete_events(ids):
+    """
+    Delete events with their enrollments
+    :param ids: list of event ids
+    :return: list of results
+    """
+    found = {row.id for row in _select_in([Event.id], Event.id, set(ids))}
+    leaderboard.remove_event_scores(found)
+    for chunk in _chunks(found):
+        db.session.execute(delete(EventUser).where(EventUser.event_id.in_(chunk)))
+        db.session.execute(delete(Event).where(Event.id.in_(chunk)))
+    return [_result(index, 204 if id in found else 404, id=id) for index, id in enumerate(ids)]
+
+
+def create_users(items):
+    """
+    :param items: list of dict with UserForm fields
+    :return: list of results
+    """
+    results, valid = [], []
+    for index, item in enumerate(items):
+        data, errors = _validate(UserForm, USER_FIELDS, item)
+        if errors:
+            results.append(_result(index, 400, errors=errors))
+        else:
+            valid.append((index, data))
+    taken = {row.username for row in _select_in([User.username], User.username,
+                                                {data['username'] for _, data in valid})}
+    rows, indexes = [], []
+    for index, data in valid:
+        if data['username'] in taken:
+            results.append(_result(index, 409, errors={'username': ['Username already in use.']}))
+            continue
+        taken.add(data['username'])
+        rows.append({**data, 'password': hash_password(data['password'])})
+        indexes.append(index)
+    results.extend(_result(index, 201, id=id) for index, id in zip(indexes, _insert(User, rows)))
+    return sorted(results, key=lambda result: result['index'])
+
+
+def update_users(items, partial=True):
+    """
+    Update users; the password is rehashed only when it is sent
+    :param items: list of dict with `id` and UserForm fields
+    :param partial: fields missing from an item keep their current values
+    :return: list of results
+    """
+    results, pending = [], []
+    for index, item in enumerate(items):
+        try:
+            pending.append((index, _parse_id(item.get('id')), item))
+        except ValueError:
+            results.append(_result(index, 400, errors={'id': ['Integer id is required.']}))
+    columns = [User.id] + [getattr(User, name) for name in USER_FIELDS]
+    current = {row.id: row._asdict() for row in _select_in(columns, User.id, {id for _, id, _ in pending})}
+    usernames = {item['username'] for _, _, item in pending if isinstance(item.get('username'), str)}
+    owners = {row.username: row.id for row in _select_in([User.username, User.id], User.username, usernames)}
+    rows = []
+    for index, id, item in pending:
+        if id not in current:
+            results.append(_result(index, 404, id=id))
+            continue
+        data, errors = _validate(UserForm, USER_FIELDS, {**current[id], **item} if partial else item)
+        if errors:
+            results.append(_result(index, 400, id=id, errors=errors))
+            continue
+        if owners.setdefault(data['username'], id) != id:
+            results.append(_result(index, 409, id=id, errors={'username': ['Username already in use.']}))
+            continue
+        data['password'] = hash_password(item['password']) if 'password' in item else current[id]['password']
+        rows.append({**data, 'id': id})
+        results.append(_result(index, 200, id=id))
+    if rows:
+        db.session.execute(update(User), rows)
+    return sorted(results, key=lambda result: result['index'])
+
+
+def delete_users(ids):
+    """
+    Delete users with their enrollments (archived ones too);
+    users who created events, hot or archived, are kept (409)
+    :param ids: list of user ids
+    :return: list of results
+    """
+    found = {row.id for row in _select_in([User.id], User.id, set(ids))}
+    authors = set()
+    for model in (Event, ArchivedEvent):
+        authors.update(row.created_by for row in _select_in([model.created_by], model.created_by, found))
+    removable = found - authors
+    leaderboard.remove_users(removable)
+    for chunk in _chunks(removable):
+        for event_model, binding_model in ((Event, EventUser), (ArchivedEvent, ArchivedEventUser)):
+            bindings = (db.select(func.count(binding_model.id))
+                        .where(binding_model.event_id == event_model.id, binding_model.user_id.in_(chunk))
+                        .scalar_subquery())
+            events = db.select(binding_model.event_id).where(binding_model.user_id.in_(chunk))
+            db.session.execute(update(event_model)
+                               .where(event_model.id.in_(events))
+                               .values(participants_count=event_model.participants_count - bindings)
+                               .execution_options(synchronize_session=False))
+            db.session.execute(delete(binding_model).where(binding_model.user_id.in_(chunk)))
+        db.session.execute(delete(User).where(User.id.in_(chunk)))
+    return [_result(index, 204 if id in removable else 409 if id in authors else 404, id=id)
+            for index, id in enumerate(ids)]
+
+
+def create_enrollments(items):
+    """
+    Bind users to events; every binding takes a place with the enrollment
+    service rules (active, not ended, not full)
+    :param items: list of dict with `event_id`, `user_id` and optional `score`
+    :return: list of results
+    """
+    results, pending = [], []
+    for index, item in enumerate(items):
+        try:
+            score = item.get('score', 0)
+            pending.append((index, _parse_id(item.get('event_id')), _parse_id(item.get('user_id')),
+                            0 if score is None else _parse_id(score)))
+        except ValueError:
+            results.append(_result(index, 400, errors={'item': ['Integer event_id and user_id are required.']}))
+    event_ids = {row.id for row in _select_in([Event.id], Event.id, {item[1] for item in pending})}
+    user_ids = {row.id for row in _select_in([User.id], User.id, {item[2] for item in pending})}
+    bound = {(row.event_id, row.user_id) for row in _select_in([EventUser.event_id, EventUser.user_id],
+                                                               EventUser.event_id, event_ids)
+             if row.user_id in user_ids}
+    rows, indexes = [], []
+    today = datetime.date.today()
+    for index, event_id, user_id, score in pending:
+        if event_id not in event_ids or user_id not in user_ids:
+            results.append(_result(index, 404, event_id=event_id, user_id=user_id))
+            continue
+        if (event_id, user_id) in bound:
+            results.append(_result(index, 409, event_id=event_id, user_id=user_id))
+            continue
+        try:
+            reserve_place(event_id, today)
+        except EnrollmentError as exc:
+            results.append(_result(index, exc.status, event_id=event_id, user_id=user_id,
+                                   errors={'event_id': [exc.message]}))
+            continue
+        bound.add((event_id, user_id))
+        rows.append({'event_id': event_id, 'user_id': user_id, 'created_at': today, 'score': score})
+        indexes.append(index)
+    results.extend(_result(index, 201, id=id) for index, id in zip(indexes, _insert(EventUser, rows)))
+    deltas = {}
+    for row in rows:
+        deltas[row['user_id']] = deltas.get(row['user_id'], 0) + row['score']
+    leaderboard.add_scores(deltas)
+    return sorted(results, key=lambda result: result['index'])
+
+
+def update_scores(event_id, items):
+    """
+    Set scores of the event participants and move the users' totals by the difference
+    :param event_id: int
+    :param items: list of dict with `user_id` and `score`
+    :return: list of results
+    """
+    results, pending = [], []
+    for index, item in enumerate(items):
+        try:
+            pending.append((index, _parse_id(item.get('user_id')), _parse_id(item.get('score'))))
+        except ValueError:
+            results.append(_result(index, 400, errors={'item': ['Integer user_id and score are required.']}))
+    current = {}
+    for chunk in _chunks({item[1] for item in pending}):
+        query = (db.select(EventUser.id, EventUser.user_id, EventUser.score)
+                 .where(EventUser.event_id == event_id, EventUser.user_id.in_(chunk)))
+        current.update((row.user_id, row) for row in db.session.execute(query))
+    rows, deltas = {}, {}
+    for index, user_id, score in pending:
+        if user_id not in current:
+            results.append(_result(index, 404, event_id=event_id, user_id=user_id))
+            continue
+        binding = current[user_id]
+        previous = rows[user_id]['score'] if user_id in rows else binding.score or 0
+        rows[user_id] = {'id': binding.id, 'score': score}
+        deltas[user_id] = deltas.get(user_id, 0) + score - previous
+        results.append(_result(index, 200, event_id=event_id, user_id=user_id, score=score))
+    if rows:
+        db.session.execute(update(EventUser), list(rows.values()))
+    leaderboard.add_scores(deltas)
+    return sorted(results, key=lambda result: result['index'])
@@ -0,0 +1,208 @@
+import calendar
+import datetime
+import math
+
+import sqlalchemy
+from flask import request
+from sqlalchemy import case, func
+
+from app import db
+from app.error_handlers import InvalidArgument
+from app.event.models import Event
+
+# Date-range (calendar) queries over event intervals.
+# An event overlaps the range [start, end] when begin_at <= end and
+# end_at >= start. Alone, that is a scan of every event begun before `end`.
+# No event is longer than the longest one, so begin_at >= start - longest
+# narrows it to a range scan of the (begin_at, end_at) index covering the
+# requested days plus the longest duration, with end_at checked in the index.
+# The longest duration is one seek in an expression index (SQLite).
+
+DURATION_INDEX = 'ix_event_duration'
+# calendar order: the (begin_at, end_at) index order, id makes it unique
+CALENDAR_KEYS = [Event.begin_at, Event.end_at, Event.id]
+
+
+def duration_expr(dialect_name):
+    """
+    Event duration in days
+    :param dialect_name: database dialect name
+    :return: SQL expression
+    """
+    if dialect_name == 'sqlite':
+        return func.julianday(Event.end_at) - func.julianday(Event.begin_at)
+    return Event.end_at - Event.begin_at
+
+
+def create_duration_index(target, connection, **kw):
+    """
+    Expression index on the event duration (metadata 'after_create' hook, SQLite only)
+    :param target: MetaData
+    :param connection: Connection
+    :return:
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {DURATION_INDEX} '
+                               f'ON event (julianday(end_at) - julianday(begin_at))')
+
+
+def drop_duration_index(target, connection, **kw):
+    """
+    Drop the duration index (metadata 'before_drop' hook)
+    :param target: MetaData
+    :param connection: Connection
+    :return:
+    """
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql(f'DROP INDEX IF EXISTS {DURATION_INDEX}')
+
+
+sqlalchemy.event.listen(db.metadata, 'after_create', create_duration_index)
+sqlalchemy.event.listen(db.metadata, 'before_drop', drop_duration_index)
+
+
+def select_longest_days(dialect_name):
+    """
+    Duration of the longest event
+    :param dialect_name: database dialect name
+    :return: Select of one value (None without events)
+    """
+    return db.select(func.max(duration_expr(dialect_name)))
+
+
+def longest_event_days():
+    """
+    Duration of the longest event in whole days
+    :return: int
+    """
+    return math.ceil(db.session.execute(select_longest_days(db.engine.dialect.name)).scalar() or 0)
+
+
+def overlapping(query, start=None, end=None, longest=None):
+    """
+    Restrict a select of events to the ones overlapping [start, end]
+    :param query: Select from event
+    :param start: date or None (no lower bound)
+    :param end: date or None (no upper bound)
+    :param longest: longest event in days, longest_event_days() by default
+    :return: Select
+    """
+    if end is not None:
+        query = query.where(Event.begin_at <= end)
+    if start is not None:
+        longest = longest_event_days() if longest is None else longest
+        query = query.where(Event.end_at >= start, Event.begin_at >= start - datetime.timedelta(days=longest))
+    return query
+
+
+def select_day_counts(start, end, longest):
+    """
+    Events overlapping [start, end] grouped by their first and last day
+    clipped to the range: at most (end - start + 1)^2 rows for day_counts()
+    :param start: date
+    :param end: date
+    :param longest: longest event in days
+    :return: Select of (first, last, count) rows
+    """
+    first = case((Event.begin_at < start, start), else_=Event.begin_at)
+    last = case((Event.end_at > end, end), else_=Event.end_at)
+    query = db.select(first.label('first'), last.label('last'), func.count().label('count'))
+    return overlapping(query, start, end, longest).group_by(first, last)
+
+
+def spread_day_counts(rows, start, end):
+    """
+    Per-day counts from select_day_counts rows (difference array)
+    :param rows: (first, last, count) rows
+    :param start: date
+    :param end: date
+    :return: list of (date, count) for every day of the range
+    """
+    days = (end - start).days + 1
+    changes = [0] * (days + 1)
+    for first, last, count in rows:
+        first, last = _as_date(first), _as_date(last)
+        changes[(first - start).days] += count
+        changes[(last - start).days + 1] -= count
+    counts, running = [], 0
+    for offset in range(days):
+        running += changes[offset]
+        counts.append((start + datetime.timedelta(days=offset), running))
+    return counts
+
+
+def _as_date(value):
+    # SQLite returns the clipped bound of CASE as text
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def day_counts(start, end):
+    """
+    Number of events on each day of [start, end], one aggregate query
+    :param start: date
+    :param end: date
+    :return: list of (date, count)
+    """
+    rows = db.session.execute(select_day_counts(start, end, longest_event_days())).all()
+    return spread_day_counts(rows, start, end)
+
+
+def month_range(year, month):
+    """
+    :return: (first day, last day) of the month
+    """
+    return datetime.date(year, month, 1), datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def month_weeks(year, month):
+    """
+    Weeks (Monday to Sunday) of a month view, days of the neighbour months included
+    :return: list of lists of 7 dates
+    """
+    return calendar.Calendar().monthdatescalendar(year, month)
+
+
+def week_range(day):
+    """
+    :return: (Monday, Sunday) of the day's week
+    """
+    monday = day - datetime.timedelta(days=day.weekday())
+    return monday, monday + datetime.timedelta(days=6)
+
+
+def parse_month(value, default=None):
+    """
+    :param value: 'YYYY-MM' or None
+    :param default: date, today by default
+    :return: (year, month)
+    :raise ValueError: malformed month
+    """
+    if not value:
+        default = default or datetime.date.today()
+        return default.year, default.month
+    year, _, month = value.partition('-')
+    day = datetime.date(int(year), int(month), 1)
+    return day.year, day.month
+
+
+def request_range(args=None):
+    """
+    Date range from `from` and `to` query arguments (ISO dates, either may be missing)
+    :param args: query arguments, current request's by default
+    :return: (start, end) or None without both arguments
+    :raise InvalidArgument: malformed dates or start after end
+    """
+    args = request.args if args is None else args
+    if not args.get('from') and not args.get('to'):
+        return None
+    dates = []
+    for name in ('from', 'to'):
+        try:
+            dates.append(datetime.date.fromisoformat(args[name]) if args.get(name) else None)
+        except ValueError:
+            raise InvalidArgument(name, 'Expected a date (YYYY-MM-DD).')
+    start, end = dates
+    if start and end and start > end:
+        raise InvalidArgument('from', 'Must not be after `to`.')
+    return start, end
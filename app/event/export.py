@@ -0,0 +1,104 @@
+import csv
+import datetime
+import io
+import itertools
+import json
+
+from flask import Response, stream_with_context
+
+from app import db
+from app.event.models import Event, EventUser, ArchivedEventUser
+from app.user.models import User
+
+# Streaming exports: rows are fetched in batches of YIELD_PER through a
+# server-side cursor and written out chunk by chunk, so memory use does
+# not depend on the number of rows.
+
+YIELD_PER = 1000
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+EVENT_COLUMNS = [Event.id, Event.description, Event.created_by, Event.begin_at, Event.end_at,
+                 Event.max_users, Event.is_active, Event.participants_count]
+USER_COLUMNS = [User.id, User.first_name, User.last_name, User.username]
+EVENT_USER_COLUMNS = [EventUser.id, EventUser.user_id, EventUser.event_id, EventUser.created_at,
+                      EventUser.score, User.username]
+ARCHIVED_EVENT_USER_COLUMNS = [ArchivedEventUser.id, ArchivedEventUser.user_id, ArchivedEventUser.event_id,
+                               ArchivedEventUser.created_at, ArchivedEventUser.score, User.username]
+
+
+def _json_default(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _ndjson_chunks(keys, partitions):
+    for rows in partitions:
+        yield ''.join(json.dumps(dict(zip(keys, row)), default=_json_default, separators=(',', ':')) + '\n'
+                      for row in rows)
+
+
+def _csv_chunks(keys, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _partitions(query):
+    return db.session.execute(query.execution_options(yield_per=YIELD_PER)).partitions()
+
+
+def stream_query(query, fmt, filename, fallback=None):
+    """
+    Stream rows of a column select as NDJSON or CSV
+    :param query: Select of columns
+    :param fmt: 'ndjson' or 'csv'
+    :param filename: download name without extension
+    :param fallback: Select with the same columns streamed when `query` has no rows, optional
+    :return: Response
+    """
+    keys = [column['name'] for column in query.column_descriptions]
+
+    def generate():
+        partitions = _partitions(query)
+        first = next(partitions, None)
+        if first is None:
+            partitions = _partitions(fallback) if fallback is not None else iter(())
+        else:
+            partitions = itertools.chain([first], partitions)
+        chunks = _csv_chunks if fmt == 'csv' else _ndjson_chunks
+        yield from chunks(keys, partitions)
+
+    response = Response(stream_with_context(generate()), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    return response
+
+
+def export_events(fmt):
+    return stream_query(db.select(*EVENT_COLUMNS).order_by(Event.id), fmt, 'events')
+
+
+def export_users(fmt):
+    return stream_query(db.select(*USER_COLUMNS).order_by(User.id), fmt, 'users')
+
+
+def _select_event_users(id, columns, model):
+    return db.select(*columns).join(model.user).where(model.event_id == id).order_by(model.id)
+
+
+def export_event_users(id, fmt):
+    """
+    Participants of the event, from the archive tables for an archived event
+    """
+    return stream_query(_select_event_users(id, EVENT_USER_COLUMNS, EventUser), fmt, f'event_{id}_users',
+                        fallback=_select_event_users(id, ARCHIVED_EVENT_USER_COLUMNS, ArchivedEventUser))
@@ -0,0 +1,124 @@
+import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import update, insert, delete
+
+from app import db
+from app.event.models import Event, EventUser, ArchivedEvent, ArchivedEventUser
+from app.scheduler import scheduler
+
+EXPIRE_CHUNK_SIZE = 1000
+ARCHIVE_CHUNK_SIZE = 500
+EVENT_COLUMNS = ('id', 'description', 'created_by', 'begin_at', 'end_at', 'max_users', 'is_active',
+                 'participants_count')
+EVENT_USER_COLUMNS = ('id', 'user_id', 'event_id', 'created_at', 'score')
+
+
+@scheduler.job('expire-events', interval=3600)
+def expire_events(today=None, chunk_size=EXPIRE_CHUNK_SIZE):
+    """
+    Deactivate events that ended before today, `chunk_size` rows per transaction.
+    Every chunk is one UPDATE of ids picked from the (is_active, end_at) index,
+    committed on its own so other writers wait at most one chunk. The commits
+    invalidate the cached event responses (cache tag 'event').
+    :param today: date (defaults to today)
+    :param chunk_size: rows per UPDATE
+    :return: number of deactivated events
+    """
+    today = today or datetime.date.today()
+    total = 0
+    while True:
+        chunk = (db.select(Event.id)
+                 .where(Event.is_active.is_(True), Event.end_at < today)
+                 .limit(chunk_size)
+                 .scalar_subquery())
+        query = (update(Event)
+                 .where(Event.id.in_(chunk))
+                 .values(is_active=False)
+                 .execution_options(synchronize_session=False))
+        rows = db.session.execute(query).rowcount
+        if not rows:
+            # nothing changed: don't invalidate the cache
+            db.session.rollback()
+            return total
+        db.session.commit()
+        total += rows
+        if rows < chunk_size:
+            return total
+
+
+def select_archivable_ids(cutoff, chunk_size):
+    """
+    Ids of deactivated events that ended before `cutoff` ((is_active, end_at) index).
+    event and event_user ids are AUTOINCREMENT, so the ids of archived rows are
+    never given to new rows and every event can be archived.
+    :param cutoff: date
+    :param chunk_size: max number of ids
+    :return: Select of ids
+    """
+    return (db.select(Event.id)
+            .where(Event.is_active.is_(False), Event.end_at < cutoff)
+            .limit(chunk_size))
+
+
+@scheduler.job('archive-events', interval=24 * 3600)
+def archive_events(cutoff=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Move events deactivated by expire-events that ended more than
+    ARCHIVE_AFTER_DAYS ago, with their enrollments, to the archive tables.
+    Each chunk of `chunk_size` events is copied (INSERT ... SELECT) and
+    deleted in one transaction, so an event is always in exactly one of
+    the tables. The deletes invalidate the cached event responses.
+    :param cutoff: date, archive events ended before it (default: ARCHIVE_AFTER_DAYS ago)
+    :param chunk_size: events per transaction
+    :return: number of archived events
+    """
+    cutoff = cutoff or datetime.date.today() - datetime.timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    total = 0
+    while True:
+        ids = db.session.execute(select_archivable_ids(cutoff, chunk_size)).scalars().all()
+        if not ids:
+            db.session.rollback()
+            return total
+        events = db.select(*(getattr(Event, name) for name in EVENT_COLUMNS)).where(Event.id.in_(ids))
+        event_users = (db.select(*(getattr(EventUser, name) for name in EVENT_USER_COLUMNS))
+                       .where(EventUser.event_id.in_(ids)))
+        db.session.execute(insert(ArchivedEvent).from_select(EVENT_COLUMNS, events))
+        db.session.execute(insert(ArchivedEventUser).from_select(EVENT_USER_COLUMNS, event_users))
+        db.session.execute(delete(EventUser).where(EventUser.event_id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        db.session.execute(delete(Event).where(Event.id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+        total += len(ids)
+        if len(ids) < chunk_size:
+            return total
+
+
+@click.command('expire-events')
+@click.option('--today', type=click.DateTime(formats=['%Y-%m-%d']), help='Deactivate events ended before this date.')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=EXPIRE_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def expire_events_command(today, chunk_size):
+    """
+    Deactivate ended events
+    """
+    report = scheduler.run(current_app._get_current_object(), 'expire-events',
+                           today=today.date() if today else None, chunk_size=chunk_size)
+    click.echo(f'Deactivated {report["rows"]} events in {report["seconds"]:.3f} s.')
+
+
+@click.command('archive-events')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive events ended before this date (default: ARCHIVE_AFTER_DAYS ago).')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=ARCHIVE_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def archive_events_command(before, chunk_size):
+    """
+    Move old finished events and their enrollments to the archive tables
+    """
+    report = scheduler.run(current_app._get_current_object(), 'archive-events',
+                           cutoff=before.date() if before else None, chunk_size=chunk_size)
+    click.echo(f'Archived {report["rows"]} events in {report["seconds"]:.3f} s.')
@@ -0,0 +1,158 @@
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.event.models import EventUser, UserScore
+from app.user.models import User
+
+# Event and global standings.
+# Per-event standings read the (event_id, score) index of event_user;
+# global standings read user_score, a per-user total that every score
+# writer keeps current by adding deltas (add_scores) in its own transaction.
+# Top N is an index scan of N entries and the rank of a user is one index
+# range count, so no request sorts all enrollments. The count still reads
+# one index entry per better score: a rank costs O(rank), not O(log n).
+# Ranks are standard competition ranks: equal scores share a rank.
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+IN_CHUNK_SIZE = 500
+# dialect -> insert() with on_conflict_do_update
+UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), IN_CHUNK_SIZE):
+        yield values[start:start + IN_CHUNK_SIZE]
+
+
+def _ranked(rows, first_rank):
+    """
+    Standings rows with competition ranks
+    :param rows: rows with user_id, username and score, best first
+    :param first_rank: rank of the first row
+    :return: list of dict
+    """
+    standings, rank, previous = [], first_rank, None
+    for position, row in enumerate(rows):
+        if previous is not None and row.score != previous:
+            rank = first_rank + position
+        previous = row.score
+        standings.append({'rank': rank, 'user_id': row.user_id, 'username': row.username, 'score': row.score})
+    return standings
+
+
+def add_scores(deltas):
+    """
+    Add score deltas to the users' totals (rows are created on first score).
+    One INSERT ... ON CONFLICT DO UPDATE per batch, so concurrent writers
+    never race between a check and an insert.
+    Runs in the current transaction together with the event_user change.
+    :param deltas: dict user_id -> delta
+    :return:
+    """
+    rows = [{'user_id': user_id, 'total_score': delta} for user_id, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    connection = db.session.connection()
+    table = UserScore.__table__
+    query = UPSERTS[connection.dialect.name](table)
+    query = query.on_conflict_do_update(index_elements=[table.c.user_id],
+                                        set_={'total_score': table.c.total_score + query.excluded.total_score})
+    # Core executemany: the ORM bulk INSERT has no ON CONFLICT
+    connection.execute(query, rows)
+    db.session.info.setdefault('cache_tags', set()).add(table.name)
+
+
+def remove_event_scores(event_ids):
+    """
+    Subtract the scores of the events' enrollments from the users' totals,
+    call before the enrollments are deleted
+    :param event_ids: list of event ids
+    :return:
+    """
+    deltas = {}
+    for chunk in _chunks(event_ids):
+        query = (db.select(EventUser.user_id, func.sum(EventUser.score))
+                 .where(EventUser.event_id.in_(chunk))
+                 .group_by(EventUser.user_id))
+        for user_id, total in db.session.execute(query):
+            deltas[user_id] = deltas.get(user_id, 0) - (total or 0)
+    add_scores(deltas)
+
+
+def remove_users(user_ids):
+    """
+    Drop totals of deleted users
+    :param user_ids: list of user ids
+    :return:
+    """
+    for chunk in _chunks(user_ids):
+        db.session.execute(delete(UserScore).where(UserScore.user_id.in_(chunk)))
+
+
+def event_top(event_id, limit=DEFAULT_LIMIT):
+    """
+    Best scores of the event
+    :param event_id: int
+    :param limit: number of rows
+    :return: list of dict (rank, user_id, username, score)
+    """
+    query = (db.select(EventUser.user_id, User.username, EventUser.score)
+             .join(EventUser.user)
+             .where(EventUser.event_id == event_id, EventUser.score.is_not(None))
+             .order_by(EventUser.score.desc(), EventUser.id)
+             .limit(limit))
+    return _ranked(db.session.execute(query).all(), 1)
+
+
+def event_rank(event_id, user_id):
+    """
+    Standing of the user in the event
+    :param event_id: int
+    :param user_id: int
+    :return: dict (rank, user_id, score) or None when the user is not bound to the event
+    """
+    query = db.select(EventUser.score).where(EventUser.event_id == event_id, EventUser.user_id == user_id)
+    score = db.session.execute(query).first()
+    if score is None:
+        return None
+    score = score.score or 0
+    better = (db.select(func.count())
+              .where(EventUser.event_id == event_id, EventUser.score > score))
+    return {'rank': db.session.execute(better).scalar() + 1, 'user_id': user_id, 'score': score}
+
+
+def global_top(limit=DEFAULT_LIMIT):
+    """
+    Best total scores over all events
+    :param limit: number of rows
+    :return: list of dict (rank, user_id, username, score)
+    """
+    query = (db.select(UserScore.user_id, User.username, UserScore.total_score.label('score'))
+             .join(User, User.id == UserScore.user_id)
+             .order_by(UserScore.total_score.desc(), UserScore.user_id)
+             .limit(limit))
+    return _ranked(db.session.execute(query).all(), 1)
+
+
+def global_rank(user_id):
+    """
+    Standing of the user over all events (users without scores have total 0)
+    :param user_id: int
+    :return: dict (rank, user_id, score)
+    """
+    score = db.session.execute(db.select(UserScore.total_score).where(UserScore.user_id == user_id)).scalar()
+    score = score or 0
+    better = db.select(func.count()).where(UserScore.total_score > score)
+    return {'rank': db.session.execute(better).scalar() + 1, 'user_id': user_id, 'score': score}
+
+
+def request_limit(value):
+    """
+    Clamp `limit` request argument
+    :param value: int or None
+    :return: int
+    """
+    return min(max(value or DEFAULT_LIMIT, 1), MAX_LIMIT)
@@ -6,12 +6,18 @@ from app import db
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(), nullable=False)
-    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     user = db.relationship('User')
     begin_at = db.Column(db.Date, nullable=False)
     end_at = db.Column(db.Date, nullable=False)
     max_users = db.Column(db.Integer, nullable=False)
     is_active = db.Column(db.Boolean, nullable=False)
+    participants_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # AUTOINCREMENT: ids of deleted (archived) events are never given to new events
+    __table_args__ = (db.Index('ix_event_is_active_end_at', 'is_active', 'end_at'),
+                      # date-range queries, see app.event.calendar
+                      db.Index('ix_event_begin_at_end_at', 'begin_at', 'end_at'),
+                      {'sqlite_autoincrement': True})
 
 
 class EventUser(db.Model):
@@ -21,5 +27,45 @@ class EventUser(db.Model):
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     event = db.relationship('Event')
     created_at = db.Column(db.Date, nullable=False)
-    score = db.Column(db.Integer)
-    __table_args__ = (UniqueConstraint('user_id', 'event_id', name='_column1_column2_uc'),)
+    score = db.Column(db.Integer, default=0, server_default='0')
+    __table_args__ = (UniqueConstraint('user_id', 'event_id', name='_column1_column2_uc'),
+                      db.Index('ix_event_user_event_id_score', 'event_id', 'score'),
+                      {'sqlite_autoincrement': True})
+
+
+class UserScore(db.Model):
+    """
+    Sum of the user's event scores, kept up to date by the score writers
+    (see app.event.leaderboard) so the global leaderboard is an index scan
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_score = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
+
+# Cold storage: events archived by the archive-events job (app.event.jobs)
+# with their enrollments, same columns and ids as in the hot tables
+# (AUTOINCREMENT there, so an archived id is never reused).
+# Lists only read the hot tables; lookups by id fall through (app.event.queries).
+class ArchivedEvent(db.Model):
+    __tablename__ = 'event_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User')
+    begin_at = db.Column(db.Date, nullable=False)
+    end_at = db.Column(db.Date, nullable=False)
+    max_users = db.Column(db.Integer, nullable=False)
+    is_active = db.Column(db.Boolean, nullable=False)
+    participants_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class ArchivedEventUser(db.Model):
+    __tablename__ = 'event_user_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User')
+    event_id = db.Column(db.Integer, db.ForeignKey('event_archive.id'), nullable=False)
+    event = db.relationship('ArchivedEvent')
+    created_at = db.Column(db.Date, nullable=False)
+    score = db.Column(db.Integer, default=0, server_default='0')
+    __table_args__ = (db.Index('ix_event_user_archive_event_id_user_id', 'event_id', 'user_id'),)
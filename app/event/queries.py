@@ -0,0 +1,122 @@
+import datetime
+
+from sqlalchemy.orm import joinedload, load_only
+
+from app import db
+from app.event.models import Event, EventUser, ArchivedEvent, ArchivedEventUser
+from app.event.serializers import FEED_EVENT, EVENT_USER, ARCHIVED_EVENT_USER
+from app.user.models import User
+
+# Shared queries for the event views.
+# Related users are loaded in the same statement (join + column projection)
+# so rendering a page never lazy-loads User rows one by one.
+# Lookups by event id fall through to the archive tables (archive-events job)
+# when the hot tables have nothing for the id.
+
+
+def select_events_brief():
+    """
+    Events with only the columns needed for lists (id, description)
+    :return: Select
+    """
+    return db.select(Event).options(load_only(Event.id, Event.description))
+
+
+def select_feed_events(kind, user_id, fields=None, today=None):
+    """
+    Events of a user's feed, each list is one set-based query:
+    'created' - events the user created,
+    'joined' - events the user is bound to (join),
+    'joinable' - active, not ended, not full events the user isn't bound to (anti-join)
+    :param kind: 'created', 'joined' or 'joinable'
+    :param user_id: int
+    :param fields: FEED_EVENT fields, all by default
+    :param today: date (defaults to today)
+    :return: Select of rows
+    """
+    query = FEED_EVENT.select(fields)
+    if kind == 'created':
+        return query.where(Event.created_by == user_id)
+    if kind == 'joined':
+        return query.join(EventUser, EventUser.event_id == Event.id).where(EventUser.user_id == user_id)
+    bound = db.select(EventUser.id).where(EventUser.event_id == Event.id, EventUser.user_id == user_id)
+    return query.where(Event.is_active.is_(True),
+                       Event.end_at >= (today or datetime.date.today()),
+                       Event.participants_count < Event.max_users,
+                       ~bound.exists())
+
+
+def get_event(id):
+    """
+    Event by id with its author loaded in the same query (archived events too)
+    :param id: int
+    :return: Event, ArchivedEvent or None
+    """
+    for model in (Event, ArchivedEvent):
+        query = (db.select(model)
+                 .options(joinedload(model.user).load_only(User.id, User.username,
+                                                           User.first_name, User.last_name))
+                 .where(model.id == id))
+        event = db.session.execute(query).scalar()
+        if event is not None:
+            return event
+    return None
+
+
+def is_event_user(id, user_id):
+    """
+    Check if user is bound to the event (archived events too)
+    :param id: event id
+    :param user_id: int
+    :return: bool
+    """
+    for model in (EventUser, ArchivedEventUser):
+        query = db.select(model.id).where(model.event_id == id, model.user_id == user_id)
+        if db.session.execute(query).first() is not None:
+            return True
+    return False
+
+
+def get_event_users(id):
+    """
+    Users bound to the event: (id, username) rows (archived events too)
+    :param id: event id
+    :return: list of Row
+    """
+    for model in (EventUser, ArchivedEventUser):
+        query = (db.select(model.user_id.label('id'), User.username)
+                 .join(model.user)
+                 .where(model.event_id == id)
+                 .order_by(model.id))
+        rows = db.session.execute(query).all()
+        if rows:
+            return rows
+    return []
+
+
+def select_event_users_detail(id, fields=None, archived=False):
+    """
+    Event bindings with usernames (EVENT_USER rows)
+    :param id: event id
+    :param fields: EVENT_USER fields, all by default
+    :param archived: select from the archive tables
+    :return: Select of rows
+    """
+    serializer, model = (ARCHIVED_EVENT_USER, ArchivedEventUser) if archived else (EVENT_USER, EventUser)
+    return (serializer.select(fields)
+            .join(model.user)
+            .where(model.event_id == id)
+            .order_by(model.id))
+
+
+def get_event_users_detail(id, fields=None):
+    """
+    Event bindings with usernames (EVENT_USER rows, archived events too)
+    :param id: event id
+    :param fields: EVENT_USER fields, all by default
+    :return: list of Row
+    """
+    rows = db.session.execute(select_event_users_detail(id, fields)).all()
+    if not rows:
+        rows = db.session.execute(select_event_users_detail(id, fields, archived=True)).all()
+    return rows
@@ -0,0 +1,115 @@
+import re
+
+import sqlalchemy
+from sqlalchemy import column, table, text
+
+from app import db
+from app.event.models import Event
+
+# External-content FTS5 index over event descriptions.
+# Rows are kept in sync with the event table by triggers, so every
+# insert/update/delete (ORM or raw SQL) is reflected without app code.
+FTS_TABLE = 'event_fts'
+fts = table(FTS_TABLE, column('rowid'), column('description'), column('rank'))
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"description, content='event', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON event BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON event BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) "
+    f"VALUES ('delete', old.id, old.description); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF description ON event BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) "
+    f"VALUES ('delete', old.id, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); "
+    f"END",
+]
+
+
+def is_fts_available(bind):
+    """
+    Check if the full-text index can be used with the given engine/connection
+    :param bind: Engine or Connection
+    :return: bool
+    """
+    return bind.dialect.name == 'sqlite'
+
+
+def create_search_index(target, connection, **kw):
+    """
+    Create FTS5 table and sync triggers (metadata 'after_create' hook).
+    Fills the index from existing rows when the table is created for the first time.
+    :param target: MetaData
+    :param connection: Connection
+    :return:
+    """
+    if not is_fts_available(connection):
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(target, connection, **kw):
+    """
+    Drop FTS5 table and triggers (metadata 'before_drop' hook)
+    :param target: MetaData
+    :param connection: Connection
+    :return:
+    """
+    if not is_fts_available(connection):
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+sqlalchemy.event.listen(db.metadata, 'after_create', create_search_index)
+sqlalchemy.event.listen(db.metadata, 'before_drop', drop_search_index)
+
+
+def build_match_query(pattern):
+    """
+    Turn user input into an FTS5 MATCH expression with prefix matching.
+    Every word is quoted (so FTS operators in user input are literal) and
+    must be present: "pyth meet" -> "pyth"* "meet"*
+    :param pattern: str
+    :return: str or None if there is nothing to search for
+    """
+    terms = re.findall(r'\w+', pattern or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_events_query(pattern):
+    """
+    Build a select of events matching the pattern, best matches first
+    :param pattern: str
+    :return: Select or None if there is nothing to search for
+    """
+    if not is_fts_available(db.engine):
+        terms = re.findall(r'\w+', pattern or '')
+        if not terms:
+            return None
+        query = db.select(Event)
+        for term in terms:
+            query = query.where(Event.description.ilike(f'%{term}%'))
+        return query.order_by(Event.id)
+    match = build_match_query(pattern)
+    if match is None:
+        return None
+    return (db.select(Event)
+            .join(fts, fts.c.rowid == Event.id)
+            .where(text(f'{FTS_TABLE} MATCH :match').bindparams(match=match))
+            .order_by(fts.c.rank))
@@ -0,0 +1,44 @@
+from app.event.models import Event, EventUser, ArchivedEventUser
+from app.serializers import Serializer
+from app.user.models import User
+
+EVENT = Serializer(
+    Event,
+    id=Event.id,
+    description=Event.description,
+    created_by=Event.created_by,
+    begin_at=Event.begin_at,
+    end_at=Event.end_at,
+    max_users=Event.max_users,
+    is_active=Event.is_active,
+)
+
+FEED_EVENT = Serializer(
+    Event,
+    id=Event.id,
+    description=Event.description,
+    begin_at=Event.begin_at,
+    end_at=Event.end_at,
+    max_users=Event.max_users,
+    participants_count=Event.participants_count,
+)
+
+# select() of EVENT_USER must be joined to users: .join(EventUser.user)
+EVENT_USER = Serializer(
+    EventUser,
+    id=EventUser.id,
+    user_id=EventUser.user_id,
+    event_id=EventUser.event_id,
+    created_at=EventUser.created_at,
+    username=User.username,
+)
+
+# the same fields over the archived enrollments (must be joined to users: .join(ArchivedEventUser.user))
+ARCHIVED_EVENT_USER = Serializer(
+    ArchivedEventUser,
+    id=ArchivedEventUser.id,
+    user_id=ArchivedEventUser.user_id,
+    event_id=ArchivedEventUser.event_id,
+    created_at=ArchivedEventUser.created_at,
+    username=User.username,
+)
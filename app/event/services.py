@@ -0,0 +1,71 @@
+import datetime
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.event.leaderboard import add_scores
+from app.event.models import Event, EventUser
+
+
+class EnrollmentError(Exception):
+    """
+    User can't be bound to the event
+    """
+
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def reserve_place(event_id, today=None):
+    """
+    Take a place in the event with one conditional UPDATE of its participants counter.
+    The row is locked by the UPDATE until the transaction ends, so concurrent
+    enrollments can't overshoot max_users.
+    :param event_id: int
+    :param today: date (defaults to today)
+    :return:
+    :raise EnrollmentError: event not found, closed or full
+    """
+    today = today or datetime.date.today()
+    query = (update(Event)
+             .where(Event.id == event_id,
+                    Event.is_active.is_(True),
+                    Event.end_at >= today,
+                    Event.participants_count < Event.max_users)
+             .values(participants_count=Event.participants_count + 1)
+             .execution_options(synchronize_session=False))
+    if db.session.execute(query).rowcount == 1:
+        return
+    event = db.session.get(Event, event_id)
+    if event is None:
+        raise EnrollmentError('Event not found', 404)
+    if not event.is_active or event.end_at < today:
+        raise EnrollmentError('Event is closed')
+    raise EnrollmentError('Event is full')
+
+
+def enroll(event_id, user_id, score=0):
+    """
+    Bind user to the event enforcing is_active, end_at and max_users.
+    Runs in the current transaction; the caller commits, or rolls back on error.
+    :param event_id: int
+    :param user_id: int
+    :param score: int
+    :return: EventUser
+    :raise EnrollmentError:
+    """
+    exists = db.select(EventUser.id).where(EventUser.event_id == event_id, EventUser.user_id == user_id)
+    if db.session.execute(exists).first():
+        raise EnrollmentError('User already joined')
+    reserve_place(event_id)
+    event_user = EventUser(event_id=event_id, user_id=user_id, created_at=datetime.date.today(), score=score)
+    db.session.add(event_user)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        raise EnrollmentError('User already joined')
+    add_scores({user_id: score})
+    return event_user
@@ -1,16 +1,27 @@
 import datetime
 
-import jwt
-from flask import Blueprint, request, jsonify, render_template, flash, redirect, url_for, session
+from flask import (Blueprint, request, jsonify, render_template, flash, redirect, url_for, session, abort, g,
+                   make_response)
 from flask.views import MethodView
+from sqlalchemy.exc import OperationalError
 
 from app import db
-from app.config import SECRET_KEY
-from app.decorators import login_required, token_required
+from app.cache import cached
+from app.decorators import login_required, token_required, rate_limit, csrf_required
+from app.error_handlers import InvalidArgument
+from app.event import bulk, calendar, export, leaderboard
 from app.event.forms import EventForm
 from app.event.models import Event
 from app.event.models import EventUser
+from app.event.queries import (select_events_brief, get_event, is_event_user, get_event_users,
+                               get_event_users_detail, select_feed_events)
+from app.event.search import search_events_query
+from app.event.services import enroll, EnrollmentError
+from app.event.serializers import EVENT, FEED_EVENT, EVENT_USER
+from app.pagination import is_keyset_request, keyset_paginate_request, request_offset_window
+from app.tokens import tokens, TokenError
 from app.user.models import User
+from app.user.serializers import USER
 
 # Events block
 event = Blueprint('event', __name__)
@@ -18,14 +29,20 @@ event = Blueprint('event', __name__)
 
 # Class based views for task 40
 class EventListView(MethodView):
+    decorators = [cached(tags=['event'])]
+
     def get(self):
-        events = Event.query.all()
+        events = db.session.execute(select_events_brief()).scalars()
         return render_template('class/list.html', items=events, type='event')
 
 
 class EventDetailView(MethodView):
+    decorators = [cached(tags=['event', 'user'])]
+
     def get(self, id):
-        event = Event.query.get_or_404(id)
+        event = get_event(id)
+        if event is None:
+            abort(404)
         return render_template('class/detail.html', item=event, type='event')
 
 
@@ -53,6 +70,7 @@ def create_event():
         event_users.user_id = session.get('user_id')
         event_users.created_at = datetime.date.today()
         event_users.score = 0
+        event_to_add.participants_count = 1
         db.session.add(event_users)
         db.session.commit()
         return redirect(url_for('event.get_event_by_id', id=event_to_add.id))
@@ -61,15 +79,26 @@ def create_event():
 
 @event.get('/events/')
 @login_required
+@cached(tags=['event'])
 def get_events():
     """
-    Get all events list
+    Get all events list.
+    Page numbers by default, cursor mode with `after`/`before` arguments
     :return: rendered template (event/list.html)
     """
-    # if request.args:
+    if is_keyset_request():
+        cursor_page = keyset_paginate_request(select_events_brief(), [Event.id])
+        events = [{'id': item.id, 'description': item.description} for item in cursor_page]
+        context = {
+            'cursor_page': cursor_page,
+            'events': events,
+            'size': cursor_page.size,
+            'title': 'Events List'
+        }
+        return render_template('event/list.html', **context)
     page = request.args.get('page', type=int)
     size = request.args.get('size', type=int, default=0)
-    pagination = Event.query.paginate(page=page, per_page=size, error_out=False)
+    pagination = db.paginate(select_events_brief(), page=page, per_page=size, error_out=False)
     events = [{'id': item.id, 'description': item.description} for item in pagination]
     context = {
         'pagination': pagination,
@@ -84,39 +113,68 @@ def get_events():
 @login_required
 def search_event():
     """
-    Search events by description
-    :return:
+    Search events by description (full-text, prefix matching, best matches first)
+    :return: rendered template (event/list.html)
     """
     pattern = request.args.get('query')
-    if pattern:
-        query = db.session.query(Event).where(Event.description == pattern)
-        events = db.session.execute(query).scalars()
-        context = [{'id': item.id, 'description': item.description} for item in events]
-        return render_template('event/list.html', events=context, title='Search result')
+    query = search_events_query(pattern)
+    if query is not None:
+        page = request.args.get('page', type=int)
+        size = request.args.get('size', type=int, default=0)
+        pagination = db.paginate(query, page=page, per_page=size, error_out=False)
+        events = [{'id': item.id, 'description': item.description} for item in pagination]
+        context = {
+            'pagination': pagination,
+            'events': events,
+            'size': size,
+            'query': pattern,
+            'endpoint': 'event.search_event',
+            'title': 'Search result'
+        }
+        return render_template('event/list.html', **context)
     return redirect(url_for('event.get_events')), 302
 
 
+@event.get('/feed/<any(created, joined, joinable):kind>/')
+@login_required
+@cached(tags=['event', 'event_user'])
+def get_feed(kind):
+    """
+    Events the logged in user created, joined or can join (cursor pagination)
+    :param kind: 'created', 'joined' or 'joinable'
+    :return: rendered template (event/feed.html)
+    """
+    cursor_page = keyset_paginate_request(select_feed_events(kind, session.get('user_id')), [Event.id])
+    context = {
+        'cursor_page': cursor_page,
+        'events': FEED_EVENT.dump(cursor_page, FEED_EVENT.fields()),
+        'kind': kind,
+        'size': cursor_page.size,
+        'title': f'{kind.capitalize()} events'
+    }
+    return render_template('event/feed.html', **context)
+
+
 @event.get('/events/<int:id>/')
 @login_required
+@cached(tags=['event', 'event_user', 'user'])
 def get_event_by_id(id):
     """
     Get event by id
     :param id: int
     :return: rendered template (event/detail.html)
     """
-    users_list = list()
-    query = db.select(Event).where(Event.id == id)
-    context = db.session.execute(query).scalar()
-    query = db.select(EventUser).where(EventUser.event_id == id)
-    users = db.session.execute(query).scalars()
-    for item in users:
-        users_list.append(item.user_id)
+    context = get_event(id)
+    if context is None:
+        abort(404)
+    is_participant = is_event_user(id, session.get('user_id'))
     return render_template('event/detail.html', id=id,
-                           context=context, now_date=datetime.date.today(), users_list=users_list)
+                           context=context, now_date=datetime.date.today(), is_participant=is_participant)
 
 
 @event.route('/events/<int:id>/update/', methods=['GET', 'POST'])
 @login_required
+@csrf_required
 def update_event(id):
     """
     Edit and update event
@@ -135,6 +193,9 @@ def update_event(id):
         form.created_by = session.get('user_id')
         return render_template('event/update.html', form=form, id=event_to_update.id)
     else:
+        if form.max_users.data is not None and form.max_users.data < event_to_update.participants_count:
+            flash(bulk.max_users_error(event_to_update.participants_count), category='danger')
+            return redirect(url_for('event.update_event', id=event_to_update.id))
         try:
             form.populate_obj(event_to_update)
             event_to_update.created_by = session.get('user_id')
@@ -149,35 +210,34 @@ def update_event(id):
 
 @event.get('/events/<int:id>/users/')
 @login_required
+@cached(tags=['event_user', 'user'])
 def get_users_by_event_id(id):
     """
     Get users by event id
     :param id:
     :return: rendered template (event/users.html)
     """
-    query = db.select(EventUser).where(EventUser.event_id == id)
-    users = db.session.execute(query).scalars()
-    context = [{'id': item.user_id,
-                'username': item.user.username} for item in users]
+    context = [{'id': item.id,
+                'username': item.username} for item in get_event_users(id)]
     return render_template('event/users.html', id=id, event_users=context)
 
 
 @event.post('/events/<int:id>/users')
 @login_required
+@csrf_required
 def bind_user_by_event_id(id):
     """
     Bind user to selected ivent
     :param id:
     :return:
     """
-    user_to_add = EventUser()
-    user_to_add.event_id = id
-    user_to_add.user_id = session.get('user_id')
-    user_to_add.created_at = datetime.date.today()
-    user_to_add.score = 0
     try:
-        db.session.add(user_to_add)
+        enroll(id, session.get('user_id'))
         db.session.commit()
+    except EnrollmentError as exc:
+        db.session.rollback()
+        flash(exc.message, 'danger')
+        return redirect(url_for('event.get_event_by_id', id=id))
     except Exception:
         db.session.rollback()
         flash('Something went wrong...', 'danger')
@@ -186,15 +246,194 @@ def bind_user_by_event_id(id):
     return redirect(url_for('event.get_users_by_event_id', id=id))
 
 
+@event.get('/events/<int:id>/leaderboard/')
+@login_required
+@cached(tags=['event_user', 'user'])
+def get_event_leaderboard(id):
+    """
+    Event standings with the rank of the logged in user
+    :param id: event id
+    :return: rendered template (event/leaderboard.html)
+    """
+    limit = leaderboard.request_limit(request.args.get('limit', type=int))
+    context = {
+        'standings': leaderboard.event_top(id, limit),
+        'current': leaderboard.event_rank(id, session.get('user_id')),
+        'title': f'Event {id} leaderboard'
+    }
+    return render_template('event/leaderboard.html', **context)
+
+
+@event.get('/leaderboard/')
+@login_required
+@cached(tags=['user_score', 'user'])
+def get_leaderboard():
+    """
+    Standings by total score over all events with the rank of the logged in user
+    :return: rendered template (event/leaderboard.html)
+    """
+    limit = leaderboard.request_limit(request.args.get('limit', type=int))
+    context = {
+        'standings': leaderboard.global_top(limit),
+        'current': leaderboard.global_rank(session.get('user_id')),
+        'title': 'Leaderboard'
+    }
+    return render_template('event/leaderboard.html', **context)
+
+
+@event.get('/calendar/')
+@login_required
+@cached(tags=['event'])
+def get_calendar():
+    """
+    Month view: number of events on each day, `month` is YYYY-MM (current month by default)
+    :return: rendered template (event/calendar.html)
+    """
+    try:
+        year, month = calendar.parse_month(request.args.get('month'))
+    except ValueError:
+        abort(400)
+    first, last = calendar.month_range(year, month)
+    counts = dict(calendar.day_counts(first, last))
+    previous = first - datetime.timedelta(days=1)
+    following = last + datetime.timedelta(days=1)
+    context = {
+        'weeks': calendar.month_weeks(year, month),
+        'counts': counts,
+        'previous': f'{previous.year:04}-{previous.month:02}',
+        'next': f'{following.year:04}-{following.month:02}',
+        'title': first.strftime('%B %Y')
+    }
+    return render_template('event/calendar.html', **context)
+
+
+@event.get('/calendar/week/')
+@login_required
+@cached(tags=['event'])
+def get_calendar_week():
+    """
+    Week view: events overlapping the week (Monday to Sunday) of `date`
+    (today by default), in calendar order with cursor pagination
+    :return: rendered template (event/week.html)
+    """
+    try:
+        day = datetime.date.fromisoformat(request.args.get('date') or datetime.date.today().isoformat())
+    except ValueError:
+        abort(400)
+    monday, sunday = calendar.week_range(day)
+    query = calendar.overlapping(FEED_EVENT.select(required=('id', 'begin_at', 'end_at')), monday, sunday)
+    cursor_page = keyset_paginate_request(query, calendar.CALENDAR_KEYS)
+    context = {
+        'cursor_page': cursor_page,
+        'events': FEED_EVENT.dump(cursor_page, FEED_EVENT.fields()),
+        'date': monday,
+        'previous': monday - datetime.timedelta(days=7),
+        'next': monday + datetime.timedelta(days=7),
+        'size': cursor_page.size,
+        'title': f'Week {monday} - {sunday}'
+    }
+    return render_template('event/week.html', **context)
+
+
 # API section
+def api_list(serializer, keys, restrict=None):
+    """
+    Serialized rows of an API list with `fields` selection.
+    Page numbers by default, cursor mode with `after`/`before` arguments
+    :param serializer: Serializer
+    :param keys: sort columns
+    :param restrict: function adding conditions to the select, optional
+    :return: JSON payload
+    """
+    fields = serializer.request_fields()
+    query = serializer.select(fields, required=tuple(key.key for key in keys))
+    if restrict is not None:
+        query = restrict(query)
+    if is_keyset_request():
+        cursor_page = keyset_paginate_request(query, keys)
+        return cursor_page.to_dict(serializer.dump(cursor_page, fields))
+    offset, limit = request_offset_window()
+    return serializer.dump(db.session.execute(query.order_by(*keys).offset(offset).limit(limit)), fields)
+
+
+def bulk_error(message):
+    """
+    Abort a bulk request with a JSON 400 in the per-item errors format
+    :param message: str
+    :return:
+    """
+    abort(make_response(jsonify({'errors': {'body': [message]}}), 400))
+
+
+def bulk_payload():
+    """
+    JSON body as a list of items
+    :return: (items, many) or aborts with a JSON 400
+    """
+    try:
+        return bulk.as_items(request.get_json(silent=True))
+    except ValueError as exc:
+        bulk_error(str(exc))
+
+
+def single_payload():
+    """
+    JSON body of a single-resource route
+    :return: dict or aborts with a JSON 400 (also for an array)
+    """
+    items, many = bulk_payload()
+    if many:
+        bulk_error('Expected an object')
+    return items[0]
+
+
+def bulk_response(results, many):
+    """
+    Per-item results; a single item answers with its own status,
+    a batch with the common status or 207 when statuses differ
+    :param results: list of dict
+    :param many: request body was an array
+    :return: JSON response
+    """
+    if not many:
+        return jsonify(results[0]), results[0]['status']
+    statuses = {result['status'] for result in results}
+    return jsonify(results), statuses.pop() if len(statuses) == 1 else 207
+
+
+def commit_bulk(results):
+    """
+    Commit the batch or roll it back when nothing in it succeeded
+    :param results: list of dict
+    :return: results
+    """
+    if any(result['status'] < 300 for result in results):
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return results
+
+
 @event.post('/api/events/')
 @token_required
 def create_event_by_api():
     """
-    Create new event (API)
-    :return: Test...
+    Create one event or a batch of events (API)
+    :return: JSON (per-item results)
+    """
+    items, many = bulk_payload()
+    return bulk_response(commit_bulk(bulk.create_events(items, g.current_user_id)), many)
+
+
+@event.patch('/api/events/')
+@token_required
+def update_events_by_api():
+    """
+    Update a batch of events, every item must have `id` (API)
+    :return: JSON (per-item results)
     """
-    return jsonify(request.json), 201
+    items, _ = bulk_payload()
+    return bulk_response(commit_bulk(bulk.update_events(items)), True)
 
 
 @event.patch('/api/events/<int:id>/')
@@ -203,9 +442,10 @@ def update_event_by_api(id):
     """
     Update event by id (API)
     :param id: int
-    :return: Test...
+    :return: JSON (result)
     """
-    return jsonify(request.json), 200
+    item = single_payload()
+    return bulk_response(commit_bulk(bulk.update_events([{**item, 'id': id}])), False)
 
 
 @event.delete('/api/events/<int:id>/')
@@ -214,69 +454,195 @@ def delete_event(id):
     """
     Delete event by id (API)
     :param id: int
-    :return: Test...
+    :return:
     """
-    return "", 204
+    result = commit_bulk(bulk.delete_events([id]))[0]
+    return "", result['status']
+
+
+@event.delete('/api/events/')
+@token_required
+def delete_events_by_api():
+    """
+    Delete a batch of events, body is an array of ids (API)
+    :return: JSON (per-item results)
+    """
+    ids = request.get_json(silent=True)
+    if not isinstance(ids, list) or not ids or not all(type(id) is int for id in ids):
+        bulk_error('Expected a non-empty array of integer ids')
+    return bulk_response(commit_bulk(bulk.delete_events(ids)), True)
+
+
+@event.post('/api/events/<int:id>/users/')
+@token_required
+def api_bind_user_by_event_id(id):
+    """
+    Bind the token user to the event (API)
+    :param id: int
+    :return: JSON
+    """
+    try:
+        event_user = enroll(id, g.current_user_id)
+        db.session.commit()
+    except EnrollmentError as exc:
+        db.session.rollback()
+        return jsonify({'message': exc.message}), exc.status
+    except OperationalError:
+        # e.g. the database stayed locked longer than the busy timeout
+        db.session.rollback()
+        return jsonify({'message': 'Database is busy, try again'}), 503
+    return jsonify({'id': event_user.id, 'event_id': id, 'user_id': g.current_user_id}), 201
+
+
+@event.post('/api/enrollments/')
+@token_required
+def create_enrollments_by_api():
+    """
+    Bind users to events, one or a batch of {event_id, user_id, score} (API)
+    :return: JSON (per-item results)
+    """
+    items, many = bulk_payload()
+    return bulk_response(commit_bulk(bulk.create_enrollments(items)), many)
+
+
+@event.patch('/api/events/<int:id>/scores/')
+@token_required
+def update_scores_by_api(id):
+    """
+    Set scores of event participants, one or a batch of {user_id, score} (API)
+    :param id: event id
+    :return: JSON (per-item results)
+    """
+    items, many = bulk_payload()
+    return bulk_response(commit_bulk(bulk.update_scores(id, items)), many)
+
+
+@event.get('/api/events/<int:id>/leaderboard/')
+@token_required
+@cached(tags=['event_user', 'user'], per_user=False)
+def api_get_event_leaderboard(id):
+    """
+    Event standings (API); `limit` rows, `user_id` adds that user's standing
+    :param id: event id
+    :return: JSON
+    """
+    context = {'items': leaderboard.event_top(id, leaderboard.request_limit(request.args.get('limit', type=int)))}
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        context['user'] = leaderboard.event_rank(id, user_id)
+    return jsonify(context), 200
+
+
+@event.get('/api/leaderboard/')
+@token_required
+@cached(tags=['user_score', 'user'], per_user=False)
+def api_get_leaderboard():
+    """
+    Standings by total score over all events (API); `limit` rows, `user_id` adds that user's standing
+    :return: JSON
+    """
+    context = {'items': leaderboard.global_top(leaderboard.request_limit(request.args.get('limit', type=int)))}
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        context['user'] = leaderboard.global_rank(user_id)
+    return jsonify(context), 200
+
+
+@event.get('/api/feed/<any(created, joined, joinable):kind>/')
+@token_required
+@cached(tags=['event', 'event_user'])
+def get_feed_by_api(kind):
+    """
+    Events the token user created, joined or can join (API, cursor pagination),
+    `fields` selects the columns
+    :param kind: 'created', 'joined' or 'joinable'
+    :return: JSON
+    """
+    fields = FEED_EVENT.request_fields()
+    events = keyset_paginate_request(select_feed_events(kind, g.current_user_id, fields), [Event.id])
+    return jsonify(events.to_dict(FEED_EVENT.dump(events, fields))), 200
 
 
 @event.get('/api/users/')
 @token_required
+@cached(tags=['user'], per_user=False)
 def get_users_by_api():
     """
-    Get all users list (API)
-    :return: Test...
+    Get all users list (API), `fields` selects the columns.
+    Page numbers by default, cursor mode with `after`/`before` arguments
+    :return: JSON
     """
-    page = request.args.get('page', type=int)
-    size = request.args.get('size', type=int, default=0)
-    users = User.query.paginate(page=page, per_page=size, error_out=False)
-    context = [{'id': item.id,
-                'first_name': item.first_name,
-                'last_name': item.last_name,
-                'username': item.username} for item in users]
-    return jsonify(context), 200
+    return jsonify(api_list(USER, [User.id])), 200
 
 
 @event.get('/api/events/')
 @token_required
+@cached(tags=['event'], per_user=False)
 def get_events_by_api():
     """
-    Get all users list (API)
-    :return: Test...
+    Get all events list (API), `fields` selects the columns.
+    With `from`/`to` (ISO dates, either may be omitted) only the events
+    overlapping the range, in calendar order (begin_at, end_at, id).
+    Page numbers by default, cursor mode with `after`/`before` arguments
+    :return: JSON
     """
-    page = request.args.get('page', type=int)
-    size = request.args.get('size', type=int, default=0)
-    events = Event.query.paginate(page=page, per_page=size, error_out=False)
-    context = [{
-        'id': item.id,
-        'description': item.description,
-        'created_by': item.created_by,
-        'begin_at': item.begin_at,
-        'end_at': item.end_at,
-        'max_users': item.max_users,
-        'is_active': item.is_active
-    } for item in events]
-    return jsonify(context), 200
+    date_range = calendar.request_range()
+    if date_range is None:
+        return jsonify(api_list(EVENT, [Event.id])), 200
+    return jsonify(api_list(EVENT, calendar.CALENDAR_KEYS,
+                            lambda query: calendar.overlapping(query, *date_range))), 200
+
+
+@event.get('/api/calendar/')
+@token_required
+@cached(tags=['event'], per_user=False)
+def get_calendar_by_api():
+    """
+    Number of events on each day of a month (API), `month` is YYYY-MM
+    (current month by default)
+    :return: JSON
+    """
+    try:
+        year, month = calendar.parse_month(request.args.get('month'))
+    except ValueError:
+        raise InvalidArgument('month', 'Expected a month (YYYY-MM).')
+    days = calendar.day_counts(*calendar.month_range(year, month))
+    return jsonify({'month': f'{year:04}-{month:02}',
+                    'days': [{'date': day, 'count': count} for day, count in days]}), 200
 
 
 @event.post('/api/users/')
 @token_required
 def create_user():
     """
-    Create a new user (API)
-    :return: Test...
+    Create one user or a batch of users (API)
+    :return: JSON (per-item results)
+    """
+    items, many = bulk_payload()
+    return bulk_response(commit_bulk(bulk.create_users(items)), many)
+
+
+@event.patch('/api/users/')
+@token_required
+def edit_users():
+    """
+    Edit a batch of users, every item must have `id` (API)
+    :return: JSON (per-item results)
     """
-    return jsonify(request.json), 201
+    items, _ = bulk_payload()
+    return bulk_response(commit_bulk(bulk.update_users(items)), True)
 
 
 @event.post('/api/users/<int:id>/')
 @token_required
 def update_user(id):
     """
-    Update a user (API)
+    Update a user, all fields are required (API)
     :param id: int
-    :return: Test...
+    :return: JSON (result)
     """
-    return jsonify(request.json), 201
+    item = single_payload()
+    return bulk_response(commit_bulk(bulk.update_users([{**item, 'id': id}], partial=False)), False)
 
 
 @event.patch('/api/users/<int:id>/')
@@ -285,9 +651,10 @@ def edit_user(id):
     """
     Edit a user (API)
     :param id: int
-    :return: Test...
+    :return: JSON (result)
     """
-    return jsonify(request.json), 200
+    item = single_payload()
+    return bulk_response(commit_bulk(bulk.update_users([{**item, 'id': id}])), False)
 
 
 @event.delete('/api/users/<int:id>/')
@@ -296,40 +663,124 @@ def delete_user(id):
     """
     Delete a user (API)
     :param id: int
-    :return: Test...
+    :return:
     """
-    return "", 204
+    result = commit_bulk(bulk.delete_users([id]))[0]
+    if result['status'] == 409:
+        return jsonify({'message': 'User has created events'}), 409
+    return "", result['status']
 
 
 @event.post('/api/login/')
+@rate_limit('login')
 def api_login():
     """
-    Create an auth token for API login
-    :return: JSON (token)
+    Check credentials and create access and refresh tokens for API login
+    :return: JSON (token, refresh_token, expires_in)
     """
     auth = request.json
     if not auth or not auth.get('username') or not auth.get('password'):
         return jsonify({"error:": "invalid username or password"}), 401
-    token = jwt.encode({
-        'user': auth.get('username'),
-        'exp': datetime.datetime.now() + datetime.timedelta(minutes=60)
-    }, SECRET_KEY)
-    return jsonify({"token": token}), 200
+    query = db.select(User).where(User.username == auth.get('username'))
+    user = db.session.execute(query).scalar()
+    if not user or not user.check_password(auth.get('password')):
+        return jsonify({"error:": "invalid username or password"}), 401
+    if user.password_needs_rehash():
+        user.set_password(auth.get('password'))
+        db.session.commit()
+    return jsonify(tokens.issue(user)), 200
+
+
+@event.post('/api/token/refresh/')
+def api_refresh_token():
+    """
+    Exchange a refresh token for a new token pair (the used refresh token is revoked)
+    :return: JSON (token, refresh_token, expires_in)
+    """
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if not refresh_token:
+        return jsonify({'message': 'Token is missing!'}), 401
+    try:
+        claims = tokens.verify(refresh_token, token_type='refresh')
+    except TokenError as exc:
+        return jsonify({'message': str(exc)}), 401
+    user = db.session.get(User, int(claims['sub']))
+    if user is None:
+        return jsonify({'message': 'Token is invalid!'}), 401
+    if not tokens.revoke(claims):
+        # the same refresh token was exchanged concurrently: only one exchange wins
+        return jsonify({'message': 'Token has been revoked!'}), 401
+    return jsonify(tokens.issue(user)), 200
+
+
+@event.post('/api/logout/')
+@token_required
+def api_logout():
+    """
+    Revoke the access token (and the refresh token if sent in JSON body)
+    :return:
+    """
+    tokens.revoke(g.token_claims)
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if refresh_token:
+        try:
+            tokens.revoke(tokens.verify(refresh_token, token_type='refresh'))
+        except TokenError:
+            pass
+    return "", 204
 
 
 @event.get('/api/events/<int:id>/users/')
 @token_required
+@cached(tags=['event_user', 'user'], per_user=False)
 def api_get_users_by_event_id(id):
     """
-    Get event users by event id
+    Get event users by event id, `fields` selects the columns
     :param id: int
     :return: JSON
     """
-    query = db.select(EventUser).where(EventUser.event_id == id)
-    users = db.session.execute(query).scalars()
-    context = [{'id': item.id,
-                'user_id': item.user_id,
-                'event_id': item.event_id,
-                'created_at': item.created_at,
-                'username': item.user.username} for item in users]
-    return jsonify(context), 200
+    fields = EVENT_USER.request_fields()
+    return jsonify(EVENT_USER.dump(get_event_users_detail(id, fields), fields)), 200
+
+
+def export_format():
+    """
+    Export format from `format` request argument
+    :return: 'ndjson' (default) or 'csv'
+    :raise InvalidArgument: other formats
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        raise InvalidArgument('format', f'Expected one of: {", ".join(export.FORMATS)}.')
+    return fmt
+
+
+@event.get('/api/export/events/')
+@token_required
+def export_events():
+    """
+    Stream all events (API)
+    :return: NDJSON or CSV
+    """
+    return export.export_events(export_format())
+
+
+@event.get('/api/export/users/')
+@token_required
+def export_users():
+    """
+    Stream all users (API)
+    :return: NDJSON or CSV
+    """
+    return export.export_users(export_format())
+
+
+@event.get('/api/export/events/<int:id>/users/')
+@token_required
+def export_event_users(id):
+    """
+    Stream event participants (API)
+    :param id: int
+    :return: NDJSON or CSV
+    """
+    return export.export_event_users(id, export_format())
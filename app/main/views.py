@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from app import db
+from app.decorators import rate_limit, login_required, csrf_required
+from app.sessions import sessions
 from app.user.models import User
 
 main = Blueprint('main', __name__)
@@ -22,6 +23,8 @@ def login_page():
 
 
 @main.post('/login/')
+@rate_limit('login')
+@csrf_required
 def login():
     """
     Authentication by password
@@ -31,13 +34,16 @@ def login():
     password = request.form.get('password')
     query = db.select(User).where(User.username == username)
     user = db.session.execute(query).scalar()
-    if user:
-        password_hash = generate_password_hash(user.password)
-        if check_password_hash(password_hash, password):
-            session['username'] = username
-            session['user_id'] = user.id
-            session['full_name'] = f'{user.first_name} {user.last_name}'
-            return redirect('/events/', 302)
+    if user and user.check_password(password):
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+        # new session id on login (session fixation)
+        session.clear()
+        session['username'] = username
+        session['user_id'] = user.id
+        session['full_name'] = f'{user.first_name} {user.last_name}'
+        return redirect('/events/', 302)
 
     flash('Invalid username or password', 'danger')
     return redirect('/login/', 302)
@@ -52,3 +58,16 @@ def logout():
     session.clear()
     # session.pop('username', None)
     return redirect('/login/', 302)
+
+
+@main.get('/logout/all/')
+@login_required
+def logout_everywhere():
+    """
+    Logout endpoint ending every session of the user (other browsers and devices too)
+    :return:
+    """
+    sessions.logout_everywhere(session['user_id'])
+    session.clear()
+    flash('Logged out on all devices', 'success')
+    return redirect('/login/', 302)
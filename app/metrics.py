@@ -0,0 +1,233 @@
+import cProfile
+import hmac
+import os
+import random
+import time
+from bisect import bisect_left
+from threading import Lock
+
+import sqlalchemy
+from flask import g, request, has_request_context, current_app, before_render_template, template_rendered, abort
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram (cumulative buckets are computed on export)
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Thread-safe in-process store of counters and histograms.
+    Every gunicorn worker has its own registry.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def histogram(self, name, labels):
+        """
+        Histogram of the metric with exactly these labels
+        :return: Histogram or None
+        """
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """
+        Prometheus text exposition format
+        :return: str
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(self._help):
+                kind, text = self._help[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (key, labels), value in sorted(self._counters.items()):
+                    if key == name:
+                        lines.append(f'{name}{_labels(labels)} {value}')
+                for (key, labels), histogram in sorted(self._histograms.items()):
+                    if key != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {histogram.sum}')
+                    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """
+    Request instrumentation (init with `metrics.init_app(app)`):
+    per-endpoint latency, SQL statements and DB time, template render time,
+    exposed at /metrics; optional cProfile dumps of slow sampled requests.
+    """
+
+    def __init__(self):
+        self.registry = Registry()
+        self.registry.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status.')
+        self.registry.describe('http_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+        self.registry.describe('db_statements_per_request', 'histogram', 'SQL statements per request.')
+        self.registry.describe('db_time_seconds_per_request', 'histogram', 'Time spent in SQL per request.')
+        self.registry.describe('template_render_seconds', 'histogram', 'Template render time.')
+        self.registry.describe('job_runs_total', 'counter', 'Scheduled job runs by job.')
+        self.registry.describe('job_rows_total', 'counter', 'Rows processed by scheduled jobs.')
+        self.registry.describe('job_duration_seconds', 'histogram', 'Scheduled job run time.')
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_TOKEN', None)
+        # profile this share of requests (0..1) and dump the ones slower than PROFILE_SLOW_REQUEST_MS
+        app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILE_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        app.extensions['metrics'] = self
+
+    def view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                             f'Bearer {token}'.encode()):
+            abort(401)
+        return current_app.response_class(self.registry.render(), mimetype='text/plain; version=0.0.4')
+
+    @staticmethod
+    def _before_request():
+        g.metrics_start = time.perf_counter()
+        g.db_statements = 0
+        g.db_time = 0.0
+        g.profiler = None
+        if random.random() < current_app.config['PROFILE_SAMPLE_RATE']:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        labels = {'endpoint': endpoint, 'method': request.method}
+        self.registry.inc('http_requests_total', {**labels, 'status': response.status_code})
+        self.registry.observe('http_request_duration_seconds', labels, elapsed)
+        self.registry.observe('db_statements_per_request', labels, g.db_statements, STATEMENT_BUCKETS)
+        self.registry.observe('db_time_seconds_per_request', labels, g.db_time)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed * 1000 >= current_app.config['PROFILE_SLOW_REQUEST_MS']:
+                self._dump_profile(profiler, endpoint, elapsed)
+        return response
+
+    @staticmethod
+    def _teardown_request(exc):
+        # request failed before after_request: don't leave the profiler running
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+    @staticmethod
+    def _dump_profile(profiler, endpoint, elapsed):
+        directory = current_app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        filename = f'{endpoint}-{time.strftime("%Y%m%d-%H%M%S")}-{int(elapsed * 1000)}ms-{os.getpid()}.prof'
+        profiler.dump_stats(os.path.join(directory, filename))
+
+    @staticmethod
+    def _before_render(sender, template, context, **extra):
+        g.setdefault('template_starts', []).append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        starts = g.get('template_starts')
+        if starts:
+            self.registry.observe('template_render_seconds', {'template': template.name or 'string'},
+                                  time.perf_counter() - starts.pop())
+
+
+metrics = Metrics()
+
+
+# SQL statements and DB time of the current request
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if has_request_context() and 'db_statements' in g:
+        g.db_statements += 1
+        g.db_time += elapsed
+
+
+def _handle_error(context):
+    # failed statement: after_cursor_execute doesn't run, drop its start time
+    connection = context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+
+sqlalchemy.event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+sqlalchemy.event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+sqlalchemy.event.listen(Engine, 'handle_error', _handle_error)
@@ -0,0 +1,274 @@
+import base64
+import json
+import time
+from threading import Lock
+
+from flask import request, current_app
+from sqlalchemy import func, tuple_
+
+from app import db
+from app.error_handlers import InvalidArgument
+
+DEFAULT_SIZE = 20
+MAX_SIZE = 1000
+COUNT_CACHE_SIZE = 256
+
+_count_cache = {}
+_count_cache_lock = Lock()
+
+
+class KeysetPage:
+    """
+    One page of keyset (cursor) pagination.
+    `next`/`prev` are opaque cursors to pass back as `after`/`before`,
+    None when there is nothing in that direction.
+    """
+
+    def __init__(self, items, size, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.size = size
+        self.next = next_cursor
+        self.prev = prev_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def to_dict(self, items):
+        """
+        JSON envelope for API responses
+        :param items: serialized items
+        :return: dict
+        """
+        context = {'items': items, 'next': self.next, 'prev': self.prev, 'size': self.size}
+        if self.total is not None:
+            context['total'] = self.total
+        return context
+
+
+def encode_cursor(values):
+    """
+    Encode sort key values into an opaque url-safe cursor
+    :param values: tuple
+    :return: str
+    """
+    raw = json.dumps(list(values), separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode cursor produced by encode_cursor
+    :param cursor: str
+    :return: list of key values
+    :raise ValueError: malformed cursor
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Malformed cursor') from exc
+    if not isinstance(values, list):
+        raise ValueError('Malformed cursor')
+    return values
+
+
+def is_keyset_request(args=None):
+    """
+    Cursor mode is opt-in: enabled by `after` or `before` query argument (may be empty)
+    :param args: query arguments, current request's by default
+    :return: bool
+    """
+    args = request.args if args is None else args
+    return 'after' in args or 'before' in args
+
+
+def offset_window(page=None, size=None, max_size=None):
+    """
+    OFFSET/LIMIT of a page number request with db.paginate defaults
+    (page 1, 20 rows, no upper limit unless `max_size` is given)
+    :param page: int or None
+    :param size: int or None
+    :param max_size: int or None
+    :return: (offset, limit)
+    """
+    page = page if page and page > 0 else 1
+    size = size if size and size > 0 else 20
+    if max_size is not None:
+        size = min(size, max_size)
+    return (page - 1) * size, size
+
+
+def request_offset_window(args=None):
+    """
+    offset_window from `page` and `size` query arguments (sync and async API lists)
+    :param args: query arguments, current request's by default
+    :return: (offset, limit)
+    """
+    args = request.args if args is None else args
+    return offset_window(args.get('page', type=int), args.get('size', type=int))
+
+
+def count_select(query):
+    """
+    COUNT(*) of the query rows
+    :param query: Select
+    :return: Select
+    """
+    return db.select(func.count()).select_from(query.order_by(None).subquery())
+
+
+def count_rows(query, ttl=None):
+    """
+    COUNT(*) of the query, cached in-process for `ttl` seconds
+    :param query: Select
+    :param ttl: seconds, defaults to KEYSET_COUNT_TTL config (0 disables caching)
+    :return: int
+    """
+    if ttl is None:
+        ttl = current_app.config.get('KEYSET_COUNT_TTL', 30)
+    count_query = count_select(query)
+    compiled = count_query.compile()
+    key = (str(compiled), tuple(sorted(compiled.params.items(), key=lambda item: item[0])))
+    now = time.monotonic()
+    if ttl:
+        with _count_cache_lock:
+            cached = _count_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+    total = db.session.execute(count_query).scalar()
+    if ttl:
+        with _count_cache_lock:
+            if len(_count_cache) >= COUNT_CACHE_SIZE:
+                _count_cache.clear()
+            _count_cache[key] = (now + ttl, total)
+    return total
+
+
+def _selects_entity(query):
+    descriptions = query.column_descriptions
+    return len(descriptions) == 1 and descriptions[0]['expr'] is descriptions[0]['entity']
+
+
+def keyset_select(query, keys, after=None, before=None, size=DEFAULT_SIZE):
+    """
+    Select of one keyset page (with one extra row to detect more pages)
+    :param query: Select of ORM entities or rows
+    :param keys: list of unique, non-null sort columns (e.g. [Event.id])
+    :param after: cursor (str) or None
+    :param before: cursor (str) or None
+    :param size: page size
+    :return: Select
+    :raise ValueError: malformed cursor
+    """
+    key_expr = tuple_(*keys) if len(keys) > 1 else keys[0]
+    backwards = bool(before)
+    cursor = before if backwards else after
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError('Malformed cursor')
+        bound = tuple_(*values) if len(keys) > 1 else values[0]
+        query = query.where(key_expr < bound if backwards else key_expr > bound)
+    order = [key.desc() for key in keys] if backwards else keys
+    return query.order_by(None).order_by(*order).limit(size + 1)
+
+
+def keyset_page(result, query, keys, after=None, before=None, size=DEFAULT_SIZE, total=None):
+    """
+    KeysetPage from the result of keyset_select
+    :param result: Result of executing `query`
+    :param query: Select returned by keyset_select
+    :return: KeysetPage
+    """
+    items = result.scalars().all() if _selects_entity(query) else result.all()
+    backwards = bool(before)
+    has_more = len(items) > size
+    items = items[:size]
+    if backwards:
+        items.reverse()
+
+    def key_of(item):
+        return encode_cursor(getattr(item, key.key) for key in keys)
+
+    if not items:
+        return KeysetPage(items, size, total=total)
+    if backwards:
+        prev_cursor = key_of(items[0]) if has_more else None
+        next_cursor = key_of(items[-1])
+    else:
+        next_cursor = key_of(items[-1]) if has_more else None
+        prev_cursor = key_of(items[0]) if after else None
+    return KeysetPage(items, size, next_cursor, prev_cursor, total)
+
+
+def keyset_paginate(query, keys, after=None, before=None, size=DEFAULT_SIZE, with_count=False):
+    """
+    Paginate a select by its sort key without OFFSET.
+    Rows are ordered by `keys` ascending; the page starts right after the `after`
+    cursor or ends right before the `before` cursor.
+    :param query: Select of ORM entities or rows
+    :param keys: list of unique, non-null sort columns (e.g. [Event.id])
+    :param after: cursor (str) or None
+    :param before: cursor (str) or None
+    :param size: page size
+    :param with_count: also return total rows count
+    :return: KeysetPage
+    :raise ValueError: malformed cursor
+    """
+    total = count_rows(query) if with_count else None
+    page_query = keyset_select(query, keys, after, before, size)
+    return keyset_page(db.session.execute(page_query), page_query, keys, after, before, size, total)
+
+
+async def keyset_paginate_async(session, query, keys, after=None, before=None, size=DEFAULT_SIZE,
+                                with_count=False):
+    """
+    keyset_paginate for an AsyncSession (the total is not cached)
+    :param session: AsyncSession
+    :return: KeysetPage
+    :raise ValueError: malformed cursor
+    """
+    total = await session.scalar(count_select(query)) if with_count else None
+    page_query = keyset_select(query, keys, after, before, size)
+    return keyset_page(await session.execute(page_query), page_query, keys, after, before, size, total)
+
+
+def invalid_cursor(exc, args=None):
+    """
+    :param exc: ValueError of keyset_paginate
+    :param args: query arguments, current request's by default
+    :return: InvalidArgument naming the cursor argument
+    """
+    args = request.args if args is None else args
+    return InvalidArgument('before' if args.get('before') else 'after', str(exc))
+
+
+def keyset_args(args=None):
+    """
+    keyset_paginate arguments from `after`, `before`, `size` and `count` query arguments
+    :param args: query arguments, current request's by default
+    :return: dict
+    """
+    args = request.args if args is None else args
+    size = args.get('size', type=int, default=DEFAULT_SIZE) or DEFAULT_SIZE
+    return {
+        'after': args.get('after') or None,
+        'before': args.get('before') or None,
+        'size': min(max(size, 1), MAX_SIZE),
+        'with_count': args.get('count', type=int, default=0) == 1,
+    }
+
+
+def keyset_paginate_request(query, keys):
+    """
+    keyset_paginate using `after`, `before`, `size` and `count` request arguments
+    :param query: Select
+    :param keys: list of sort columns
+    :return: KeysetPage
+    :raise InvalidArgument: malformed cursor
+    """
+    try:
+        return keyset_paginate(query, keys, **keyset_args())
+    except ValueError as exc:
+        raise invalid_cursor(exc)
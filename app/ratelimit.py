@@ -0,0 +1,254 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+
+from flask import request, current_app
+from werkzeug.utils import import_string
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rate):
+    """
+    Token bucket of a rate string: '10/minute' is 10 requests in a burst,
+    refilled at 10 per minute
+    :param rate: str '<count>/<second|minute|hour|day>'
+    :return: (capacity, tokens per second)
+    :raise ValueError: malformed rate
+    """
+    count, _, period = rate.partition('/')
+    capacity = int(count)
+    if capacity < 1 or period not in PERIODS:
+        raise ValueError(f'Malformed rate: {rate}')
+    return capacity, capacity / PERIODS[period]
+
+
+def take(tokens, updated_at, now, capacity, rate, cost=1):
+    """
+    Refill a bucket for the time passed and take `cost` tokens if there are enough
+    :param tokens: tokens left at `updated_at` (None for a new, full bucket)
+    :return: (tokens left, allowed, seconds until allowed, time when the bucket is full again)
+    """
+    tokens = capacity if tokens is None else min(capacity, tokens + (now - updated_at) * rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    retry_after = 0 if allowed else (cost - tokens) / rate
+    return tokens, allowed, retry_after, now + (capacity - tokens) / rate
+
+
+class BaseStore:
+    """
+    Token bucket store interface.
+    A shared store (e.g. redis) implements `hit` atomically per key so all
+    workers draw from the same buckets.
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def hit(self, key, capacity, rate, cost=1):
+        """
+        :param key: bucket key
+        :param capacity: bucket size
+        :param rate: refill, tokens per second
+        :param cost: tokens to take
+        :return: (allowed, seconds until allowed)
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryStore(BaseStore):
+    """
+    In-process buckets: O(1) hit, least recently used keys are dropped above
+    `max_keys`, buckets that refilled completely are swept every `sweep_interval`
+    """
+
+    def __init__(self, max_keys=100000, sweep_interval=60):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_keys=config['RATELIMIT_MAX_KEYS'], sweep_interval=config['RATELIMIT_SWEEP_INTERVAL'])
+
+    def hit(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (None, now, now))
+            tokens, allowed, retry_after, full_at = take(tokens, updated_at, now, capacity, rate, cost)
+            self._buckets[key] = (tokens, now, full_at)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            if now >= self._next_sweep:
+                self._sweep(now)
+        return allowed, retry_after
+
+    def _sweep(self, now):
+        # a full bucket is the same as a missing one
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteStore(BaseStore):
+    """
+    Buckets in a SQLite file shared by the worker processes of one host
+    (stand-in for a redis store in tests and single-host deployments)
+    """
+
+    def __init__(self, path, sweep_interval=60):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._next_sweep = time.time() + sweep_interval
+        self._connection().execute('CREATE TABLE IF NOT EXISTS bucket '
+                                   '(key TEXT PRIMARY KEY, tokens REAL, updated_at REAL, full_at REAL)')
+
+    @classmethod
+    def from_config(cls, config):
+        os.makedirs(os.path.dirname(config['RATELIMIT_SQLITE_PATH']), exist_ok=True)
+        return cls(config['RATELIMIT_SQLITE_PATH'], sweep_interval=config['RATELIMIT_SWEEP_INTERVAL'])
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, capacity, rate, cost=1):
+        now = time.time()
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock first: read-modify-write is atomic across processes
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated_at FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated_at = row if row else (None, now)
+            tokens, allowed, retry_after, full_at = take(tokens, updated_at, now, capacity, rate, cost)
+            connection.execute('INSERT INTO bucket (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?) '
+                               'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, '
+                               'updated_at = excluded.updated_at, full_at = excluded.full_at',
+                               (key, tokens, now, full_at))
+            if now >= self._next_sweep:
+                connection.execute('DELETE FROM bucket WHERE full_at <= ?', (now,))
+                self._next_sweep = now + self.sweep_interval
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def clear(self):
+        self._connection().execute('DELETE FROM bucket')
+
+
+STORES = {
+    'memory': MemoryStore,
+    'sqlite': SQLiteStore,
+}
+
+
+def remote_ip():
+    """
+    Client address (behind a reverse proxy wrap the app with werkzeug's ProxyFix)
+    """
+    return request.remote_addr
+
+
+def request_username():
+    """
+    Username sent in the login form or JSON body
+    """
+    if request.is_json:
+        body = request.get_json(silent=True)
+        username = body.get('username') if isinstance(body, dict) else None
+    else:
+        username = request.form.get('username')
+    return username[:150] if isinstance(username, str) and username else None
+
+
+def remote_ip_username():
+    """
+    Username and client address: failed logins from one address can't lock
+    the account out for the user's own address
+    """
+    username = request_username()
+    return None if username is None else f'{remote_ip()}:{username}'
+
+
+# bucket kind -> key of the current request (None skips the bucket)
+KEY_FUNCTIONS = {
+    'ip': remote_ip,
+    'username': request_username,
+    'ip_username': remote_ip_username,
+}
+
+
+class RateLimiter:
+    """
+    Rate limiting extension (init with `limiter.init_app(app)`).
+    RATELIMITS maps a limit name to its buckets, e.g.
+    {'login': {'ip': '30/minute', 'ip_username': '10/minute'}}.
+    """
+
+    def __init__(self):
+        self.store = None
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMITS', {})
+        app.config.setdefault('RATELIMIT_STORE', 'memory')
+        app.config.setdefault('RATELIMIT_MAX_KEYS', 100000)
+        app.config.setdefault('RATELIMIT_SWEEP_INTERVAL', 60)
+        app.config.setdefault('RATELIMIT_SQLITE_PATH', os.path.join(app.instance_path, 'ratelimit.sqlite3'))
+        store = app.config['RATELIMIT_STORE']
+        if isinstance(store, str):
+            store = STORES.get(store) or import_string(store)
+        if isinstance(store, type):
+            store = store.from_config(app.config)
+        self.store = store
+        app.extensions['limiter'] = self
+
+    def check(self, name):
+        """
+        Take a token from every bucket of the limit for the current request
+        :param name: key of RATELIMITS
+        :return: 0 if allowed, otherwise whole seconds to wait
+        """
+        if not current_app.config['RATELIMIT_ENABLED']:
+            return 0
+        for kind, rate in current_app.config['RATELIMITS'].get(name, {}).items():
+            value = KEY_FUNCTIONS[kind]()
+            if value is None:
+                continue
+            capacity, per_second = parse_rate(rate)
+            allowed, retry_after = self.store.hit(f'{name}:{kind}:{value}', capacity, per_second)
+            if not allowed:
+                return max(math.ceil(retry_after), 1)
+        return 0
+
+
+limiter = RateLimiter()
@@ -0,0 +1,150 @@
+import fcntl
+import os
+import threading
+import time
+
+from app.metrics import metrics
+
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+
+class Job:
+    """
+    Periodic job: `func` runs in an app context and returns the number of rows it processed
+    """
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+
+
+class Scheduler:
+    """
+    Periodic jobs (init with `scheduler.init_app(app)`).
+    Jobs run once from the command line (`flask expire-events`, cron) or, with
+    SCHEDULER_ENABLED, from a daemon thread started by the first request
+    (so CLI commands and migrations don't start it). Every gunicorn worker
+    starts the thread, but only the one holding the lock file runs jobs;
+    another worker takes over when it exits.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        # job name -> report of its last run in this process
+        self.last_runs = {}
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._lock_file = None
+
+    def job(self, name, interval):
+        """
+        Decorator to register a job function
+        :param name: job name
+        :param interval: default seconds between runs (SCHEDULER_INTERVALS overrides)
+        :return:
+        """
+
+        def decorator(f):
+            self.jobs[name] = Job(name, f, interval)
+            return f
+
+        return decorator
+
+    def init_app(self, app):
+        app.config.setdefault('SCHEDULER_ENABLED', False)
+        app.config.setdefault('SCHEDULER_INTERVALS', {})
+        # seconds between checks for due jobs (and for the lock when another worker holds it)
+        app.config.setdefault('SCHEDULER_TICK', 30)
+        app.config.setdefault('SCHEDULER_LOCK_PATH', os.path.join(app.instance_path, 'scheduler.lock'))
+        app.extensions['scheduler'] = self
+        if app.config['SCHEDULER_ENABLED']:
+            app.before_request(lambda: self.start(app))
+
+    def interval(self, app, name):
+        return app.config['SCHEDULER_INTERVALS'].get(name, self.jobs[name].interval)
+
+    def run(self, app, name, **kwargs):
+        """
+        Run a job now
+        :param app: Flask app
+        :param name: job name
+        :param kwargs: job arguments
+        :return: dict report (job, rows, seconds, finished_at)
+        """
+        job = self.jobs[name]
+        start = time.perf_counter()
+        with app.app_context():
+            rows = job.func(**kwargs)
+        elapsed = time.perf_counter() - start
+        report = {'job': name, 'rows': rows, 'seconds': round(elapsed, 3), 'finished_at': time.time()}
+        self.last_runs[name] = report
+        metrics.registry.inc('job_runs_total', {'job': name})
+        metrics.registry.inc('job_rows_total', {'job': name}, rows)
+        metrics.registry.observe('job_duration_seconds', {'job': name}, elapsed, JOB_BUCKETS)
+        app.logger.info('Job %s processed %d rows in %.3f s', name, rows, elapsed)
+        return report
+
+    def start(self, app):
+        """
+        Start the scheduler thread (once per process)
+        :param app: Flask app
+        :return:
+        """
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._app = app
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _acquire(self):
+        """
+        Non-blocking exclusive lock on SCHEDULER_LOCK_PATH, held until the process exits
+        :return: bool
+        """
+        if self._lock_file is not None:
+            return True
+        path = self._app.config['SCHEDULER_LOCK_PATH']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _loop(self):
+        app = self._app
+        next_runs = {}
+        while not self._stop.is_set():
+            if self._acquire():
+                now = time.monotonic()
+                for name in self.jobs:
+                    if next_runs.setdefault(name, now) > now:
+                        continue
+                    try:
+                        self.run(app, name)
+                    except Exception:
+                        app.logger.exception('Job %s failed', name)
+                    next_runs[name] = time.monotonic() + self.interval(app, name)
+            self._stop.wait(app.config['SCHEDULER_TICK'])
+
+
+scheduler = Scheduler()
@@ -0,0 +1,124 @@
+import datetime
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+
+from app.error_handlers import InvalidArgument
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Serializer:
+    """
+    Row serializer declared as output field -> column.
+    select() projects only the wanted columns (no ORM objects are loaded)
+    and dump() turns the result tuples into dicts in the declared order.
+    """
+
+    def __init__(self, model, **columns):
+        self.model = model
+        self.columns = columns
+
+    def fields(self, names=None):
+        """
+        Validated output fields
+        :param names: list of field names or None for all
+        :return: tuple of names
+        :raise ValueError: unknown field
+        """
+        if names is None:
+            return tuple(self.columns)
+        unknown = [name for name in names if name not in self.columns]
+        if unknown or not names:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+        return tuple(name for name in self.columns if name in names)
+
+    def select(self, fields=None, required=('id',)):
+        """
+        Select of the fields' columns labeled with the field names.
+        `required` fields (e.g. keyset pagination keys) are selected after
+        them even when not requested; dump() leaves them out.
+        :param fields: tuple from fields() or None for all
+        :param required: field names
+        :return: Select
+        """
+        fields = self.fields() if fields is None else fields
+        names = fields + tuple(name for name in required if name not in fields)
+        return select(*(self.columns[name].label(name) for name in names)).select_from(self.model)
+
+    @staticmethod
+    def dump(rows, fields):
+        """
+        :param rows: result rows of select(fields)
+        :param fields: tuple from fields()
+        :return: list of dict
+        """
+        return [dict(zip(fields, row)) for row in rows]
+
+    def request_fields(self, args=None):
+        """
+        Fields from `fields` query argument (comma separated, all by default)
+        :param args: query arguments, current request's by default
+        :return: tuple of names
+        :raise InvalidArgument: unknown fields
+        """
+        value = (request.args if args is None else args).get('fields')
+        if value is None:
+            return self.fields()
+        try:
+            return self.fields([name.strip() for name in value.split(',') if name.strip()])
+        except ValueError as exc:
+            raise InvalidArgument('fields', str(exc))
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider with ISO-8601 dates instead of RFC 822
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime.date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSONProvider on orjson: same output (sorted keys, ISO dates),
+    responses are encoded straight to bytes
+    """
+
+    def _options(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options()) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    """
+    Install the JSON provider: orjson when installed (JSON_ORJSON, default True)
+    :param app: Flask app
+    :return:
+    """
+    app.config.setdefault('JSON_ORJSON', True)
+    provider = OrjsonProvider if orjson is not None and app.config['JSON_ORJSON'] else JSONProvider
+    app.json = provider(app)
@@ -0,0 +1,377 @@
+import datetime
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from sqlalchemy import delete, insert, update
+from werkzeug.utils import import_string
+
+from app import db
+from app.user.models import UserSession
+
+# Server-side sessions: the cookie holds only a random session id, the data
+# lives in a store. A request loads its session on first access and writes
+# it back only when it changed, so pages that don't touch the session (or
+# only read it) cost no store write and no cookie.
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def store_key(sid):
+    """
+    Store key of a session id: a leaked store doesn't hold usable cookies
+    :param sid: session id from the cookie
+    :return: str
+    """
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+class ServerSession(SessionMixin):
+    """
+    Session dict loaded from the store on first access.
+    Like Flask's cookie session, only assignments mark it modified:
+    mutate a stored list or dict in place and reassign it.
+    """
+
+    def __init__(self, interface, app, sid=None):
+        self.interface = interface
+        self.app = app
+        self.sid = sid
+        # session ids to delete from the store on save (cleared or rotated sessions)
+        self.dropped = []
+        self.had_cookie = sid is not None
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.expires_at = None
+        self._data = None if sid else {}
+
+    @property
+    def data(self):
+        self.accessed = True
+        if self._data is None:
+            if has_app_context():
+                loaded = self.interface.load(self.sid)
+            else:
+                # test client's session_transaction() yields the session outside of the request
+                with self.app.app_context():
+                    loaded = self.interface.load(self.sid)
+            if loaded is None:
+                # unknown or expired id: start a new session, never adopt the client's id
+                self.sid, self.new, self._data = None, True, {}
+            else:
+                self._data, self.expires_at = loaded
+        return self._data
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        """
+        Empty the session and rotate its id (the old one is deleted on save),
+        so a session cleared on login/logout can't be reused
+        """
+        self.accessed = True
+        if self.sid is not None:
+            self.dropped.append(self.sid)
+        self.sid, self.new, self._data = None, True, {}
+        self.modified = True
+
+
+class BaseStore:
+    """
+    Session store interface. Keys are store_key() of the session ids,
+    data is the serialized session.
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def load(self, key, now):
+        """
+        :return: (data, expires_at) or None for unknown and expired sessions
+        """
+        raise NotImplementedError
+
+    def save(self, key, user_id, data, expires_at):
+        raise NotImplementedError
+
+    def touch(self, key, expires_at):
+        """
+        Extend the expiry of an unchanged session
+        """
+        raise NotImplementedError
+
+    def delete(self, keys):
+        raise NotImplementedError
+
+    def delete_user(self, user_id):
+        """
+        Delete every session of the user
+        :return: number of deleted sessions
+        """
+        raise NotImplementedError
+
+    def sweep(self, now):
+        """
+        Delete expired sessions
+        :return: number of deleted sessions
+        """
+        raise NotImplementedError
+
+
+class MemoryStore(BaseStore):
+    """
+    Sessions in a dict of the worker, least recently used dropped above
+    `max_sessions`. Sessions don't survive a restart and aren't shared
+    between workers: single worker and tests only.
+    """
+
+    def __init__(self, max_sessions=10000):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_sessions=config['SESSION_MAX_ENTRIES'])
+
+    def load(self, key, now):
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None or entry[2] <= now:
+                return None
+            self._sessions.move_to_end(key)
+            return entry[1], entry[2]
+
+    def save(self, key, user_id, data, expires_at):
+        with self._lock:
+            self._sessions[key] = (user_id, data, expires_at)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def touch(self, key, expires_at):
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                self._sessions[key] = (entry[0], entry[1], expires_at)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._sessions.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            keys = [key for key, entry in self._sessions.items() if entry[0] == user_id]
+            for key in keys:
+                del self._sessions[key]
+        return len(keys)
+
+    def sweep(self, now):
+        with self._lock:
+            keys = [key for key, entry in self._sessions.items() if entry[2] <= now]
+            for key in keys:
+                del self._sessions[key]
+        return len(keys)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLStore(BaseStore):
+    """
+    Sessions in the user_session table of the app database.
+    Reads go through the request's db.session (no extra connection) on the primary,
+    a replica may not have a session created by the previous request yet;
+    writes commit on their own connection, independent of the view's transaction.
+    """
+    table = UserSession.__table__
+    # built once: a session load runs on every logged-in request
+    load_query = (db.select(table.c.data, table.c.expires_at)
+                  .where(table.c.id == db.bindparam('key'), table.c.expires_at > db.bindparam('now')))
+
+    def load(self, key, now):
+        row = db.session.execute(self.load_query, {'key': key, 'now': now},
+                                 bind_arguments={'bind': db.engine}).first()
+        return None if row is None else (row.data, row.expires_at)
+
+    def save(self, key, user_id, data, expires_at):
+        values = {'user_id': user_id, 'data': data, 'expires_at': expires_at}
+        with db.engine.begin() as connection:
+            # ids are random, so a new session is almost always an insert
+            if not connection.execute(update(self.table).where(self.table.c.id == key).values(values)).rowcount:
+                connection.execute(insert(self.table).values(id=key, **values))
+
+    def touch(self, key, expires_at):
+        with db.engine.begin() as connection:
+            connection.execute(update(self.table).where(self.table.c.id == key).values(expires_at=expires_at))
+
+    def delete(self, keys):
+        with db.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.id.in_(keys)))
+
+    def delete_user(self, user_id):
+        with db.engine.begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.user_id == user_id)).rowcount
+
+    def sweep(self, now):
+        with db.engine.begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.expires_at <= now)).rowcount
+
+
+STORES = {
+    'memory': MemoryStore,
+    'sql': SQLStore,
+}
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Flask session interface over a session store.
+    Sessions live PERMANENT_SESSION_LIFETIME on the server; the expiry of an
+    unchanged session is extended once less than half of it is left, not on
+    every request. Expired sessions are swept every SESSION_SWEEP_INTERVAL seconds.
+    """
+    serializer = session_json_serializer
+
+    def __init__(self, store, sweep_interval=300):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        # ids are 43 characters; anything else (e.g. an old signed cookie) is a new session
+        return ServerSession(self, app, sid if sid and len(sid) <= 64 else None)
+
+    def load(self, sid):
+        """
+        :param sid: session id
+        :return: (dict, expires_at) or None
+        """
+        loaded = self.store.load(store_key(sid), _now())
+        if loaded is None:
+            return None
+        data, expires_at = loaded
+        return self.serializer.loads(data), expires_at
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.dropped:
+            self.store.delete([store_key(sid) for sid in session.dropped])
+        if not session.loaded:
+            return
+        now = _now()
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.store.sweep(now)
+
+        name, domain, path = self.get_cookie_name(app), self.get_cookie_domain(app), self.get_cookie_path(app)
+        secure, samesite = self.get_cookie_secure(app), self.get_cookie_samesite(app)
+        if not session:
+            if session.had_cookie:
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite,
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        lifetime = app.permanent_session_lifetime
+        expires_at = now + lifetime
+        if session.modified:
+            session.sid = session.sid or secrets.token_urlsafe(32)
+            self.store.save(store_key(session.sid), session.get('user_id'),
+                            self.serializer.dumps(dict(session)), expires_at)
+        elif session.expires_at - now < lifetime / 2 and app.config['SESSION_REFRESH_EACH_REQUEST']:
+            self.store.touch(store_key(session.sid), expires_at)
+            if not session.permanent:
+                # browser session cookie, nothing to extend on the client
+                return
+        else:
+            return
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=secure, samesite=samesite)
+
+
+class ServerSessions:
+    """
+    Server-side sessions extension (init with `sessions.init_app(app)`).
+    SESSION_STORE is 'sql', 'memory', a store class/instance or dotted path;
+    'cookie' keeps Flask's signed cookie sessions.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('SESSION_STORE', 'sql')
+        app.config.setdefault('SESSION_MAX_ENTRIES', 10000)
+        app.config.setdefault('SESSION_SWEEP_INTERVAL', 300)
+        app.extensions['sessions'] = self
+        store = app.config['SESSION_STORE']
+        if store == 'cookie':
+            return
+        if isinstance(store, str):
+            store = STORES.get(store) or import_string(store)
+        if isinstance(store, type):
+            store = store.from_config(app.config)
+        app.session_interface = ServerSessionInterface(store, app.config['SESSION_SWEEP_INTERVAL'])
+
+    @staticmethod
+    def store():
+        """
+        :return: session store of the current app, None with cookie sessions
+        """
+        interface = current_app.session_interface
+        return interface.store if isinstance(interface, ServerSessionInterface) else None
+
+    def logout_everywhere(self, user_id):
+        """
+        Delete every server-side session of the user (bearer tokens are not affected)
+        :param user_id: int
+        :return: number of deleted sessions, None with cookie sessions
+        """
+        store = self.store()
+        return None if store is None else store.delete_user(user_id)
+
+
+sessions = ServerSessions()
+
+
+@click.command('sweep-sessions')
+@with_appcontext
+def sweep_sessions_command():
+    """
+    Delete expired server-side sessions
+    """
+    store = sessions.store()
+    if store is None:
+        click.echo('Cookie sessions, nothing to sweep.')
+        return
+    click.echo(f'Deleted {store.sweep(_now())} expired sessions.')
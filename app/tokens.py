@@ -0,0 +1,250 @@
+import datetime
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+import jwt
+from flask import current_app
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import import_string
+
+from app import db
+from app.user.models import RevokedToken
+
+ALGORITHM = 'HS256'
+
+
+class TokenError(Exception):
+    """
+    Token is missing, invalid, expired, revoked or of a wrong type
+    """
+
+
+class VerifiedTokenCache:
+    """
+    Bounded cache of already verified tokens: sha256(token) -> claims.
+    Entries are dropped at token expiry and the least recently used entry
+    is evicted when the cache is full.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self._lock:
+            claims = self._data.get(key)
+            if claims is None:
+                return None
+            if claims['exp'] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return claims
+
+    def set(self, token, claims):
+        with self._lock:
+            self._data[self.key(token)] = claims
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RevocationStore:
+    """
+    Revoked token ids (jti), kept until the token would have expired anyway.
+    Checked on every verify, including tokens answered from VerifiedTokenCache,
+    so a store shared by the workers revokes a token in all of them.
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def revoke(self, jti, exp):
+        """
+        :param jti: token id
+        :param exp: token expiry (epoch seconds)
+        :return: False if the token was already revoked
+        """
+        raise NotImplementedError
+
+    def is_revoked(self, jti):
+        raise NotImplementedError
+
+
+class MemoryRevocationStore(RevocationStore):
+    """
+    Revocations in the worker's memory: single worker and tests only
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = Lock()
+
+    def revoke(self, jti, exp):
+        with self._lock:
+            if jti in self._data:
+                return False
+            self._data[jti] = exp
+            if len(self._data) % 1000 == 0:
+                self._sweep()
+            return True
+
+    def is_revoked(self, jti):
+        return jti in self._data
+
+    def _sweep(self):
+        now = time.time()
+        for jti in [jti for jti, exp in self._data.items() if exp <= now]:
+            del self._data[jti]
+
+
+class SQLRevocationStore(RevocationStore):
+    """
+    Revocations in the revoked_token table of the app database, shared by all workers.
+    Reads go through the request's db.session on the primary (a replica may not
+    have the revocation yet); writes commit on their own connection.
+    Expired rows are deleted every `sweep_every` revocations.
+    """
+    table = RevokedToken.__table__
+    # built once: the check runs on every request with a bearer token
+    revoked_query = db.select(table.c.jti).where(table.c.jti == db.bindparam('jti'))
+
+    def __init__(self, sweep_every=1000):
+        self.sweep_every = sweep_every
+        self._revocations = 0
+        self._lock = Lock()
+
+    def revoke(self, jti, exp):
+        expires_at = datetime.datetime.fromtimestamp(exp, tz=datetime.timezone.utc).replace(tzinfo=None)
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(insert(self.table).values(jti=jti, expires_at=expires_at))
+        except IntegrityError:
+            # revoked by another request (or worker) first
+            return False
+        with self._lock:
+            self._revocations += 1
+            sweep = self._revocations % self.sweep_every == 0
+        if sweep:
+            self.sweep()
+        return True
+
+    def is_revoked(self, jti):
+        return db.session.execute(self.revoked_query, {'jti': jti},
+                                  bind_arguments={'bind': db.engine}).first() is not None
+
+    def sweep(self):
+        """
+        Delete revocations of expired tokens
+        :return: number of deleted rows
+        """
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        with db.engine.begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.expires_at <= now)).rowcount
+
+
+STORES = {
+    'memory': MemoryRevocationStore,
+    'sql': SQLRevocationStore,
+}
+
+
+class TokenManager:
+    """
+    Issues and verifies JWT access/refresh tokens (init with `tokens.init_app(app)`).
+    JWT_REVOCATION_STORE is 'sql', 'memory', a store class/instance or dotted path.
+    """
+
+    def __init__(self):
+        self.verified = VerifiedTokenCache()
+        self.revoked = MemoryRevocationStore()
+
+    def init_app(self, app):
+        app.config.setdefault('JWT_ACCESS_TTL', 15 * 60)
+        app.config.setdefault('JWT_REFRESH_TTL', 7 * 24 * 60 * 60)
+        app.config.setdefault('JWT_CACHE_SIZE', 10000)
+        app.config.setdefault('JWT_REVOCATION_STORE', 'sql')
+        self.verified.max_size = app.config['JWT_CACHE_SIZE']
+        store = app.config['JWT_REVOCATION_STORE']
+        if isinstance(store, str):
+            store = STORES.get(store) or import_string(store)
+        if isinstance(store, type):
+            store = store.from_config(app.config)
+        self.revoked = store
+        app.extensions['tokens'] = self
+
+    @staticmethod
+    def _encode(user, token_type, ttl):
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        claims = {
+            'sub': str(user.id),
+            'user': user.username,
+            'type': token_type,
+            'jti': uuid.uuid4().hex,
+            'iat': now,
+            'exp': now + datetime.timedelta(seconds=ttl),
+        }
+        return jwt.encode(claims, current_app.config['SECRET_KEY'], algorithm=ALGORITHM)
+
+    def issue(self, user):
+        """
+        Create access and refresh tokens for the user
+        :param user: User
+        :return: dict
+        """
+        access_ttl = current_app.config['JWT_ACCESS_TTL']
+        return {
+            'token': self._encode(user, 'access', access_ttl),
+            'refresh_token': self._encode(user, 'refresh', current_app.config['JWT_REFRESH_TTL']),
+            'expires_in': access_ttl,
+        }
+
+    def verify(self, token, token_type='access'):
+        """
+        Decode and check token. Signature is verified once per token,
+        later calls are answered from the verified tokens cache.
+        :param token: str
+        :param token_type: 'access' or 'refresh'
+        :return: dict of claims
+        :raise TokenError:
+        """
+        claims = self.verified.get(token)
+        if claims is None:
+            try:
+                claims = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=[ALGORITHM],
+                                    options={'require': ['exp', 'sub', 'jti', 'type']})
+            except jwt.ExpiredSignatureError:
+                raise TokenError('Token has expired!')
+            except jwt.InvalidTokenError:
+                raise TokenError('Token is invalid!')
+            self.verified.set(token, claims)
+        if claims['type'] != token_type:
+            raise TokenError('Token is invalid!')
+        if self.revoked.is_revoked(claims['jti']):
+            raise TokenError('Token has been revoked!')
+        return claims
+
+    def revoke(self, claims):
+        """
+        Revoke verified token
+        :param claims: dict returned by verify
+        :return: False if the token was already revoked (e.g. a refresh token used twice at once)
+        """
+        return self.revoked.revoke(claims['jti'], claims['exp'])
+
+
+tokens = TokenManager()
@@ -1,9 +1,92 @@
+import hmac
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
 from app import db
 
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+
+@lru_cache(maxsize=8)
+def _hash_method_prefix(method):
+    """
+    Full method string werkzeug stores for `method` (e.g. 'scrypt' -> 'scrypt:32768:8:1')
+    :param method: str
+    :return: str
+    """
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def hash_password(password):
+    """
+    Salted hash of the password (PASSWORD_HASH_METHOD config)
+    :param password: str
+    :return: str
+    """
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def is_password_hash(value):
+    return '$' in value and value.startswith(HASH_PREFIXES)
+
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     username = db.Column(db.String(50), unique=True, nullable=False)
-    password = db.Column(db.String(50), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
+
+    def set_password(self, password):
+        """
+        Store salted hash of the password (PASSWORD_HASH_METHOD config)
+        :param password: str
+        :return:
+        """
+        self.password = hash_password(password)
+
+    def check_password(self, password):
+        """
+        Verify password with a single hash computation.
+        Rows stored before hashing was introduced hold plain text and are compared in constant time.
+        :param password: str
+        :return: bool
+        """
+        if not password or not self.password:
+            return False
+        if is_password_hash(self.password):
+            return check_password_hash(self.password, password)
+        return hmac.compare_digest(self.password.encode(), password.encode())
+
+    def password_needs_rehash(self):
+        """
+        Stored password is plain text or hashed with other method/cost than configured
+        :return: bool
+        """
+        if not is_password_hash(self.password):
+            return True
+        method = _hash_method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+        return self.password.split('$', 1)[0] != method
+
+
+class UserSession(db.Model):
+    """
+    Server-side session (app.sessions.SQLStore); `id` is the SHA-256 of the
+    session id in the cookie, so the table doesn't hold usable ids
+    """
+    __tablename__ = 'user_session'
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, index=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class RevokedToken(db.Model):
+    """
+    Revoked JWT id (app.tokens.SQLRevocationStore), kept until the token expires
+    """
+    __tablename__ = 'revoked_token'
+    jti = db.Column(db.String(32), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,33 @@
+from sqlalchemy.orm import load_only
+
+from app import db
+from app.user.models import User
+
+# Shared queries for the user views.
+# Password column is never loaded for listing/detail pages.
+
+
+def select_users_brief():
+    """
+    Users with only the columns needed for lists (id, username)
+    :return: Select
+    """
+    return db.select(User).options(load_only(User.id, User.username))
+
+
+def select_users_public():
+    """
+    Users with all public columns (no password)
+    :return: Select
+    """
+    return db.select(User).options(load_only(User.id, User.username,
+                                             User.first_name, User.last_name))
+
+
+def get_user_public(id):
+    """
+    User by id without password column
+    :param id: int
+    :return: User or None
+    """
+    return db.session.execute(select_users_public().where(User.id == id)).scalar()
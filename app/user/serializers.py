@@ -0,0 +1,10 @@
+from app.serializers import Serializer
+from app.user.models import User
+
+USER = Serializer(
+    User,
+    id=User.id,
+    first_name=User.first_name,
+    last_name=User.last_name,
+    username=User.username,
+)
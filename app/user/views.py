@@ -1,11 +1,14 @@
 import sqlalchemy
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask.views import MethodView
 
 from app import db
+from app.cache import cached
 from app.decorators import login_required
+from app.pagination import is_keyset_request, keyset_paginate_request
 from app.user.forms import UserForm
 from app.user.models import User
+from app.user.queries import select_users_brief, get_user_public
 
 # Users block
 user = Blueprint('user', __name__)
@@ -13,28 +16,39 @@ user = Blueprint('user', __name__)
 
 # Class based views for task 40
 class UserListView(MethodView):
+    decorators = [cached(tags=['user'])]
+
     def get(self):
-        users = User.query.all()
+        users = db.session.execute(select_users_brief()).scalars()
         return render_template('class/list.html', items=users, type='user')
 
 
 class UserDetailView(MethodView):
+    decorators = [cached(tags=['user'])]
+
     def get(self, id):
-        user = User.query.get_or_404(id)
-        print(user)
+        user = get_user_public(id)
+        if user is None:
+            abort(404)
         return render_template('class/detail.html', item=user, type='user')
 
 
 @user.get('/users/')
 @login_required
+@cached(tags=['user'])
 def get_users():
     """
-    Get all users
+    Get all users.
+    Page numbers by default, cursor mode with `after`/`before` arguments
     :return: HTML
     """
+    if is_keyset_request():
+        cursor_page = keyset_paginate_request(select_users_brief(), [User.id])
+        users = [{'id': item.id, 'username': item.username} for item in cursor_page]
+        return render_template('user/list.html', users=users, cursor_page=cursor_page, size=cursor_page.size)
     page = request.args.get('page', type=int)
     size = request.args.get('size', type=int, default=0)
-    pagination = User.query.paginate(page=page, per_page=size, error_out=False)
+    pagination = db.paginate(select_users_brief(), page=page, per_page=size, error_out=False)
     users = [{'id': item.id, 'username': item.username} for item in pagination]
     var_s = {
         'pagination': pagination,
@@ -50,6 +64,7 @@ def user_register():
     if request.method == 'POST' and form.validate():
         user_to_add = User()
         form.populate_obj(user_to_add)
+        user_to_add.set_password(form.password.data)
         try:
             db.session.add(user_to_add)
             db.session.commit()
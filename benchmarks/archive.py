@@ -0,0 +1,135 @@
+"""
+List latency as event history grows, with everything in the hot tables
+and after the archive-events job moved the old events out.
+
+Every run seeds the same recent events (--events, from benchmarks.seed)
+plus --history old events ended 2-10 years ago, each with --per-event
+enrollments, then measures the routes, archives and measures again.
+
+    python -m benchmarks.archive --events 20000 --history 0 200000 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.seed import seed
+
+ROUTES = [
+    ('events list', '/events/?page=2&size=20'),
+    ('api events', '/api/events/?page=2&size=50'),
+    ('feed joined', '/feed/joined/'),
+    ('event users', '/api/events/{recent}/users/'),
+    ('archived event users', '/api/events/{old}/users/'),
+]
+
+
+def add_history(db_path, first_id, count, per_event, users, random_seed=1):
+    """
+    Insert `count` deactivated events that ended 2-10 years ago, with enrollments
+    :return:
+    """
+    rnd = random.Random(random_seed)
+    today = datetime.date.today()
+    connection = sqlite3.connect(db_path)
+    with connection:
+        events, enrollments = [], []
+        for i in range(first_id, first_id + count):
+            end_at = today - datetime.timedelta(days=rnd.randint(730, 3650))
+            begin_at = end_at - datetime.timedelta(days=1)
+            events.append((i, f'Old event {i}', rnd.randint(1, users), begin_at.isoformat(), end_at.isoformat(),
+                           100, False, per_event))
+            for user_id in rnd.sample(range(1, users + 1), per_event):
+                enrollments.append((user_id, i, end_at.isoformat(), rnd.randint(0, 100)))
+        connection.executemany('INSERT INTO event (id, description, created_by, begin_at, end_at, max_users, '
+                               'is_active, participants_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', events)
+        connection.executemany('INSERT INTO event_user (user_id, event_id, created_at, score) VALUES (?, ?, ?, ?)',
+                               enrollments)
+    connection.execute('ANALYZE')
+    connection.close()
+
+
+def median_ms(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers={'Authorization': client.token})
+        response.get_data()
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=20000, help='recent events')
+    parser.add_argument('--enrollments', type=int, default=50000, help='enrollments of the recent events')
+    parser.add_argument('--history', type=int, nargs='+', default=[0, 200000, 1000000], help='old events')
+    parser.add_argument('--per-event', type=int, default=2, help='enrollments per old event')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    from app import create_app, db
+    from app.config import DevelopmentConfig
+    from app.event.jobs import archive_events
+    from app.event.models import Event, ArchivedEvent
+
+    results = []
+    for history in args.history:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.sqlite3')
+
+            class BenchmarkConfig(DevelopmentConfig):
+                DEBUG = False
+                SECRET_KEY = 'benchmark'
+                SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+                PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+                CACHE_BACKEND = 'null'
+                RATELIMIT_ENABLED = False
+
+            app = create_app(BenchmarkConfig)
+            seed(db_path, args.users, args.events, args.enrollments)
+            add_history(db_path, args.events + 1, history, args.per_event, args.users)
+            client = app.test_client()
+            client.token = 'Bearer ' + client.post('/api/login/', json={'username': 'user1',
+                                                                        'password': 'password1'}).json['token']
+            with client.session_transaction() as session:
+                session['username'] = 'user1'
+                session['user_id'] = 1
+                session['full_name'] = 'First1 Last1'
+            ids = {'recent': args.events // 2, 'old': args.events + 1}
+            routes = [(name, url) for name, url in ROUTES if history or '{old}' not in url]
+
+            def measure():
+                return {name: median_ms(client, url.format(**ids), args.repeat) for name, url in routes}
+
+            hot = measure()
+            with app.app_context():
+                start = time.perf_counter()
+                archived = archive_events()
+                archive_seconds = time.perf_counter() - start
+                db.session.execute(db.text('ANALYZE'))
+                db.session.commit()
+                hot_rows = db.session.execute(db.select(db.func.count()).select_from(Event)).scalar()
+                archive_rows = db.session.execute(db.select(db.func.count()).select_from(ArchivedEvent)).scalar()
+            cold = measure()
+            with app.app_context():
+                db.engine.dispose()
+            results.append((history, hot, cold, archived, archive_seconds, hot_rows, archive_rows))
+
+    for history, hot, cold, archived, archive_seconds, hot_rows, archive_rows in results:
+        print(f'\n{history:,} old events: archived {archived:,} in {archive_seconds:.1f} s '
+              f'({archived / archive_seconds if archive_seconds else 0:,.0f} events/s), '
+              f'{hot_rows:,} hot / {archive_rows:,} archived')
+        print(f'{"route (median ms)":<24} {"all hot":>9} {"archived":>9}')
+        for name in hot:
+            print(f'{name:<24} {hot[name]:>9.2f} {cold[name]:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Throughput of the polled API reads: sync (gunicorn sync workers, run:app)
+vs async (uvicorn, asgi:application) with the same number of worker processes.
+
+Both servers run on the same seeded database; clients keep `--concurrency`
+requests in flight for `--seconds` against /api/events/ and
+/api/events/<id>/users/. The response cache is disabled unless --cache.
+
+    python -m benchmarks.async_api --workers 2 --concurrency 64 --seconds 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.seed import configure_environment, seed
+
+SERVERS = {
+    'sync': ['gunicorn', '--workers', '{workers}', '--bind', '127.0.0.1:{port}', 'run:app'],
+    'async': ['uvicorn', '--workers', '{workers}', '--port', '{port}', '--log-level', 'warning', 'asgi:application'],
+}
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not start')
+
+
+def load(base_url, paths, headers, concurrency, seconds):
+    timings, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(number):
+        client = requests.Session()
+        local, failed, i = [], 0, number
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = client.get(base_url + paths[i % len(paths)], headers=headers)
+            local.append(time.perf_counter() - start)
+            failed += response.status_code != 200
+            i += 1
+        with lock:
+            timings.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    return {
+        'req/s': len(timings) / elapsed,
+        'p50 ms': timings[len(timings) // 2] * 1000,
+        'p99 ms': timings[int(len(timings) * 0.99)] * 1000,
+        'mean ms': statistics.mean(timings) * 1000,
+        'errors': sum(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--enrollments', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        configure_environment(db_path)
+        os.environ['APP_CONFIG'] = 'production'
+        os.environ['CACHE_BACKEND'] = 'memory' if args.cache else 'null'
+        from app import create_app, db
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+        seed(db_path, args.users, args.events, args.enrollments)
+        token = app.test_client().post('/api/login/', json={'username': 'user1', 'password': 'password1'}).json
+        headers = {'Authorization': f'Bearer {token["token"]}'}
+        paths = ['/api/events/?page=3&size=50', '/api/events/?after=&size=50'] + \
+                [f'/api/events/{id}/users/' for id in range(1, args.events + 1, max(args.events // 50, 1))]
+
+        print(f'{args.workers} workers, {args.concurrency} concurrent clients, {args.seconds:g}s per mode')
+        for mode, command in SERVERS.items():
+            command = [part.format(workers=args.workers, port=args.port) for part in command]
+            server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                      env={**os.environ, 'PATH': os.path.dirname(sys.executable) + os.pathsep +
+                                           os.environ.get('PATH', '')})
+            base_url = f'http://127.0.0.1:{args.port}'
+            try:
+                wait_until_up(base_url + '/login/')
+                result = load(base_url, paths, headers, args.concurrency, args.seconds)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f'{mode:<6} ' + '  '.join(f'{key} {value:.1f}' if isinstance(value, float) else f'{key} {value}'
+                                            for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Date-range queries at scale: events overlapping a week (first page and
+count) and the per-day counts of a month.
+
+    no index    begin_at <= to AND end_at >= from, no date index
+    unbounded   the same with the (begin_at, end_at) index
+    bounded     app.event.calendar: index + begin_at >= from - longest event
+
+    python -m benchmarks.calendar --events 1000000 --repeat 5
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, text
+
+from benchmarks.seed import configure_environment, seed
+
+INDEXES = {
+    'ix_event_begin_at_end_at': 'CREATE INDEX ix_event_begin_at_end_at ON event (begin_at, end_at)',
+    'ix_event_duration': 'CREATE INDEX ix_event_duration ON event (julianday(end_at) - julianday(begin_at))',
+}
+PAGE_SIZE = 50
+
+
+def median_ms(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        configure_environment(db_path)
+        from app import create_app, db
+        from app.event import calendar
+        from app.event.models import Event
+        from app.event.serializers import EVENT
+        from app.pagination import keyset_paginate
+
+        app = create_app('development')
+        seed(db_path, 1000, args.events, 0)
+        today = datetime.date.today()
+        weeks = {'this week': calendar.week_range(today),
+                 'week 2 years ago': calendar.week_range(today - datetime.timedelta(days=730))}
+        month = calendar.month_range(today.year, today.month)
+
+        def unbounded(query, start, end):
+            return query.where(Event.begin_at <= end, Event.end_at >= start)
+
+        def page(restrict, start, end):
+            query = restrict(EVENT.select(required=('id', 'begin_at', 'end_at')), start, end)
+            keyset_paginate(query, calendar.CALENDAR_KEYS, size=PAGE_SIZE)
+
+        def count(restrict, start, end):
+            db.session.execute(restrict(db.select(func.count()).select_from(Event), start, end)).scalar()
+
+        def day_counts_per_day(restrict, start, end):
+            day = start
+            while day <= end:
+                count(restrict, day, day)
+                day += datetime.timedelta(days=1)
+
+        def scenarios(restrict):
+            results = {}
+            for name, (start, end) in weeks.items():
+                results[f'{name}: page'] = median_ms(args.repeat, lambda: page(restrict, start, end))
+                results[f'{name}: count'] = median_ms(args.repeat, lambda: count(restrict, start, end))
+            if restrict is unbounded:
+                results['month day counts'] = median_ms(args.repeat, lambda: day_counts_per_day(restrict, *month))
+            else:
+                results['month day counts'] = median_ms(args.repeat, lambda: calendar.day_counts(*month))
+            return results
+
+        modes = {}
+        with app.app_context():
+            for name in INDEXES:
+                db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+            db.session.commit()
+            modes['no index'] = scenarios(unbounded)
+            for statement in INDEXES.values():
+                db.session.execute(text(statement))
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+            modes['unbounded'] = scenarios(unbounded)
+            modes['bounded'] = scenarios(calendar.overlapping)
+
+    print(f'{args.events:,} events, median of {args.repeat} (ms); '
+          f'unbounded month day counts is one COUNT per day')
+    print(f'{"query":<26}' + ''.join(f'{mode:>12}' for mode in modes))
+    for query in modes['bounded']:
+        print(f'{query:<26}' + ''.join(f'{modes[mode][query]:>12.2f}' for mode in modes))
+
+
+if __name__ == '__main__':
+    main()
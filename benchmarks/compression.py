@@ -0,0 +1,92 @@
+"""
+Bytes on the wire and latency of the event list page and the stylesheet
+by Accept-Encoding (br only with the `brotli` package installed).
+
+Server time is measured with the Flask test client; transfer time is the
+response size over a link of --mbps, so "total" approximates what a
+client on that link waits for (round trips not included).
+
+    python -m benchmarks.compression --events 10000 --size 100 --mbps 10
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.seed import seed
+
+
+def measure(client, url, encoding, repeat):
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers={'Accept-Encoding': encoding})
+        size = len(response.get_data())
+        timings.append(time.perf_counter() - start)
+        response.close()
+    return statistics.median(timings) * 1000, size, response.headers.get('Content-Encoding', 'identity')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--size', type=int, default=100, help='events per page')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--mbps', type=float, default=10.0, help='link speed for the transfer time')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.assets import ENCODINGS, build
+    from app.config import ProductionConfig
+    from flask import url_for
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+
+        class BenchmarkConfig(ProductionConfig):
+            SECRET_KEY = 'benchmark'
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+            AUTO_CREATE_DB = True
+            CACHE_BACKEND = 'null'
+            RATELIMIT_ENABLED = False
+            SESSION_STORE = 'memory'
+            ASSETS_DIR = f'dist-benchmark-{os.getpid()}'
+
+        seed_app = create_app(BenchmarkConfig)
+        seed(db_path, 100, args.events, 0)
+        static_build = os.path.join(seed_app.static_folder, BenchmarkConfig.ASSETS_DIR)
+        build(seed_app.static_folder, BenchmarkConfig.ASSETS_DIR, seed_app.config)
+        try:
+            results = {}
+            for compress in (False, True):
+                BenchmarkConfig.COMPRESS_ENABLED = compress
+                app = create_app(BenchmarkConfig)
+                client = app.test_client()
+                with client.session_transaction() as session:
+                    session['username'] = 'user1'
+                    session['user_id'] = 1
+                    session['full_name'] = 'First1 Last1'
+                with app.test_request_context():
+                    stylesheet = url_for('static', filename='css/styles.css')
+                pages = {'event list': f'/events/?size={args.size}', 'styles.css': '/static/css/styles.css',
+                         'styles.css (built)': stylesheet}
+                for page, url in pages.items():
+                    for encoding in ('identity',) + ENCODINGS[::-1] if compress else ('identity',):
+                        mode = encoding if compress else 'off'
+                        results[(page, mode)] = measure(client, url, encoding, args.repeat)
+        finally:
+            shutil.rmtree(static_build, ignore_errors=True)
+
+    print(f'{args.events:,} events, {args.size} per page, median of {args.repeat}, transfer at {args.mbps:g} Mbit/s')
+    print(f'{"response":<20} {"accept":<9} {"encoding":<9} {"bytes":>8} {"server ms":>10} '
+          f'{"transfer ms":>12} {"total ms":>9}')
+    for (page, mode), (server_ms, size, encoding) in results.items():
+        transfer_ms = size * 8 / (args.mbps * 1000)
+        print(f'{page:<20} {mode:<9} {encoding:<9} {size:>8,} {server_ms:>10.2f} '
+              f'{transfer_ms:>12.2f} {server_ms + transfer_ms:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Concurrent joins (POST /events/<id>/users) and event list reads
+under SQLite engine profiles: default rollback journal vs tuned WAL pragmas.
+
+    python -m benchmarks.db_profiles --writers 4 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.seed import seed
+
+PROFILES = {
+    'rollback-journal': {'journal_mode': 'DELETE', 'busy_timeout': 5000},
+    'tuned': None,  # SQLITE_PRAGMAS from app.config.Config
+}
+
+
+def run_profile(name, pragmas, args):
+    from app import create_app
+    from app.config import DevelopmentConfig
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+
+        class BenchmarkConfig(DevelopmentConfig):
+            DEBUG = False
+            SECRET_KEY = 'benchmark'
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+            SQLITE_PRAGMAS = DevelopmentConfig.SQLITE_PRAGMAS if pragmas is None else pragmas
+            CACHE_BACKEND = 'null'
+
+        app = create_app(BenchmarkConfig)
+        seed(db_path, args.writers, args.events, 0)
+        with app.app_context():
+            from app import db
+            db.session.execute(db.text('UPDATE event SET is_active = 1, max_users = 1000000, '
+                                       "end_at = '9999-12-31'"))
+            db.session.commit()
+
+        stop = threading.Event()
+        counts = {'writes': 0, 'reads': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def writer(user_id):
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['username'] = f'user{user_id}'
+                session['user_id'] = user_id
+            event_id = 0
+            while not stop.is_set() and event_id < args.events:
+                event_id += 1
+                response = client.post(f'/events/{event_id}/users')
+                count('writes' if response.location.endswith('/users/') else 'errors')
+
+        def reader(number):
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['username'] = 'user1'
+                session['user_id'] = 1
+            page = number
+            while not stop.is_set():
+                page = page % 50 + 1
+                response = client.get(f'/events/?page={page}&size=20')
+                count('reads' if response.status_code == 200 else 'errors')
+
+        threads = [threading.Thread(target=writer, args=(i + 1,)) for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f'{name:>16}: {counts["writes"] / elapsed:8.1f} joins/s  {counts["reads"] / elapsed:8.1f} reads/s  '
+          f'{counts["errors"]} errors')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profile', choices=list(PROFILES), help='run only this profile')
+    args = parser.parse_args()
+    for name, pragmas in PROFILES.items():
+        if args.profile in (None, name):
+            run_profile(name, pragmas, args)
+
+
+if __name__ == '__main__':
+    main()
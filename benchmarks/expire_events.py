@@ -0,0 +1,77 @@
+"""
+Deactivation of ended events: one UPDATE against chunked UPDATEs.
+
+Reports the run time, rows per second and the longest transaction (how
+long a concurrent writer may have to wait for the database lock).
+
+    python -m benchmarks.expire_events --events 1000000 --chunks 1000 10000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from benchmarks.seed import configure_environment, seed
+
+
+class TransactionTimer:
+    """
+    Longest transaction of the ORM sessions
+    """
+
+    def __init__(self):
+        self.started = None
+        self.longest = 0.0
+
+    def begin(self, session, transaction, connection):
+        self.started = time.perf_counter()
+
+    def end(self, session):
+        if self.started is not None:
+            self.longest = max(self.longest, time.perf_counter() - self.started)
+            self.started = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--chunks', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        seeded_path = os.path.join(tmp, 'seeded.sqlite3')
+        configure_environment(db_path)
+        from app import create_app, db
+        from app.event.jobs import expire_events
+
+        app = create_app('development')
+        seed(db_path, 1000, args.events, 0)
+        with app.app_context():
+            db.engine.dispose()
+        shutil.copy(db_path, seeded_path)
+
+        timer = TransactionTimer()
+        sqlalchemy.event.listen(Session, 'after_begin', timer.begin)
+        sqlalchemy.event.listen(Session, 'after_commit', timer.end)
+        sqlalchemy.event.listen(Session, 'after_rollback', timer.end)
+
+        print(f'{"mode":<16} {"rows":>10} {"seconds":>9} {"rows/s":>11} {"longest tx ms":>14}')
+        for chunk_size in [args.events] + args.chunks:
+            with app.app_context():
+                db.engine.dispose()
+                shutil.copy(seeded_path, db_path)
+                timer.longest = 0.0
+                start = time.perf_counter()
+                rows = expire_events(chunk_size=chunk_size)
+                elapsed = time.perf_counter() - start
+            mode = 'one UPDATE' if chunk_size == args.events else f'chunks of {chunk_size}'
+            print(f'{mode:<16} {rows:>10,} {elapsed:>9.2f} {rows / elapsed:>11,.0f} {timer.longest * 1000:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Memory use of the streaming export.
+Seeds events, streams /api/export/events/ through the test client and
+samples the process RSS while consuming the body.
+
+    python -m benchmarks.export_memory --events 1000000 --format ndjson
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.seed import configure_environment, seed
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--format', default='ndjson', choices=['ndjson', 'csv'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        configure_environment(db_path)
+        from app import create_app
+        app = create_app('development')
+        seed(db_path, 100, args.events, 0)
+
+        client = app.test_client()
+        token = client.post('/api/login/', json={'username': 'user1', 'password': 'password1'}).json['token']
+        baseline = rss_mb()
+        start = time.perf_counter()
+        response = client.get(f'/api/export/events/?format={args.format}',
+                              headers={'Authorization': token}, buffered=False)
+        samples, size, rows = [], 0, 0
+        for number, chunk in enumerate(response.response):
+            size += len(chunk)
+            rows += chunk.count(b'\n')
+            if number % 100 == 0:
+                samples.append(rss_mb())
+        response.close()
+        elapsed = time.perf_counter() - start
+
+    print(f'{rows} lines, {size / 2 ** 20:.1f} MiB in {elapsed:.2f} s ({rows / elapsed:.0f} rows/s)')
+    print(f'RSS baseline {baseline:.1f} MiB, during stream min {min(samples):.1f} / max {max(samples):.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Login throughput.
+
+In-process (Flask test client, one client per thread):
+    python -m benchmarks.login --threads 4 --requests 200
+
+Against a running server, e.g. `gunicorn -w 4 -b 127.0.0.1:8000 run:app`
+started with DATABASE pointing to a database seeded by this script (--seed-only)
+and RATELIMIT_ENABLED=False:
+    python -m benchmarks.login --db bench.sqlite3 --seed-only
+    python -m benchmarks.login --url http://127.0.0.1:8000 --threads 16 --requests 2000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.seed import configure_environment, seed
+
+PASSWORD = 'benchmark-password'
+
+
+def seed_hashed(db_path, users, method):
+    seed(db_path, users, 0, 0)
+    password_hash = generate_password_hash(PASSWORD, method=method)
+    connection = sqlite3.connect(db_path)
+    with connection:
+        connection.execute('UPDATE user SET password = ?', (password_hash,))
+    connection.close()
+
+
+def run(make_post, threads, requests_count, users):
+    per_thread = requests_count // threads
+    failures = []
+
+    def worker(number):
+        post = make_post()
+        for i in range(per_thread):
+            username = f'user{(number * per_thread + i) % users + 1}'
+            status, location = post(username)
+            if status != 302 or not location.endswith('/events/'):
+                failures.append(username)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for item in workers:
+        item.start()
+    for item in workers:
+        item.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--method', default='scrypt', help='PASSWORD_HASH_METHOD')
+    parser.add_argument('--url', help='base url of a running server')
+    parser.add_argument('--db', help='database file to seed (temporary if omitted)')
+    parser.add_argument('--seed-only', action='store_true')
+    args = parser.parse_args()
+
+    if args.url:
+        import requests
+
+        def make_post():
+            http = requests.Session()
+
+            def post(username):
+                http.cookies.clear()
+                response = http.post(f'{args.url}/login/', data={'username': username, 'password': PASSWORD},
+                                     allow_redirects=False)
+                return response.status_code, response.headers.get('Location', '')
+
+            return post
+
+        rate, failed = run(make_post, args.threads, args.requests, args.users)
+        print(f'{rate:.1f} logins/s ({failed} failed) against {args.url}')
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'bench.sqlite3')
+        configure_environment(db_path)
+        os.environ['PASSWORD_HASH_METHOD'] = args.method
+        from app import create_app
+        app = create_app('development')
+        seed_hashed(db_path, args.users, args.method)
+        if args.seed_only:
+            print(f'seeded {args.users} users into {db_path}, password {PASSWORD!r}')
+            return
+
+        def make_post():
+            client = app.test_client()
+
+            def post(username):
+                response = client.post('/login/', data={'username': username, 'password': PASSWORD})
+                return response.status_code, response.location or ''
+
+            return post
+
+        rate, failed = run(make_post, args.threads, args.requests, args.users)
+        print(f'{rate:.1f} logins/s ({failed} failed), method {args.method}, {args.threads} threads')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Query plans and latency of the hot event queries without and with indexes.
+
+    python -m benchmarks.query_plans --users 10000 --events 100000 --enrollments 500000
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.seed import configure_environment, seed
+
+INDEXES = {
+    'ix_event_user_event_id': 'CREATE INDEX ix_event_user_event_id ON event_user (event_id)',
+    'ix_event_created_by': 'CREATE INDEX ix_event_created_by ON event (created_by)',
+    'ix_event_is_active_end_at': 'CREATE INDEX ix_event_is_active_end_at ON event (is_active, end_at)',
+}
+
+QUERIES = {
+    'event participants': ('SELECT user_id FROM event_user WHERE event_id = ?', lambda a: (a.events // 2,)),
+    'events by author': ('SELECT id FROM event WHERE created_by = ?', lambda a: (a.users // 2,)),
+    'joinable events': ('SELECT id FROM event WHERE is_active = 1 AND end_at >= ? LIMIT 50',
+                        lambda a: (datetime.date.today().isoformat(),)),
+}
+
+
+def measure(connection, sql, params, repeat):
+    plan = [row[-1] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'plan': plan, 'median_ms': statistics.median(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--enrollments', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        configure_environment(db_path)
+        from app import create_app
+        create_app('development')  # creates the schema
+        seed(db_path, args.users, args.events, args.enrollments)
+
+        connection = sqlite3.connect(db_path)
+        for name in INDEXES:
+            connection.execute(f'DROP INDEX IF EXISTS {name}')
+        before = {name: measure(connection, sql, params(args), args.repeat)
+                  for name, (sql, params) in QUERIES.items()}
+        for statement in INDEXES.values():
+            connection.execute(statement)
+        connection.execute('ANALYZE')
+        after = {name: measure(connection, sql, params(args), args.repeat)
+                 for name, (sql, params) in QUERIES.items()}
+        connection.close()
+
+    for name in QUERIES:
+        print(f'{name}:')
+        print(f'  before {before[name]["median_ms"]:8.3f} ms  {"; ".join(before[name]["plan"])}')
+        print(f'  after  {after[name]["median_ms"]:8.3f} ms  {"; ".join(after[name]["plan"])}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'before': before, 'after': after}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
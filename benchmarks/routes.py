@@ -0,0 +1,344 @@
+"""
+Latency, throughput and queries per request of every route.
+
+Seeds a temporary SQLite database (N users, M events, K enrollments) and
+drives each route with the Flask test client from several threads. Write
+routes that consume rows (joins, enrollments, deletes) get a fresh one per
+request. Statements are counted until the body is read, so streamed
+exports include the queries that fetch their rows. Every route of the app
+is driven except /static/ files.
+
+    python -m benchmarks.routes --users 1000 --events 10000 --enrollments 50000 --json before.json
+    python -m benchmarks.routes ... --json after.json --compare before.json
+    python -m benchmarks.routes ... --replicas 2   # GET reads from SQLite copies of the database
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+import sqlalchemy
+
+from benchmarks.seed import seed
+
+# `auth` of a route: session only, the shared API token, a token pair of
+# a new login before every request (outside the timing) for routes that
+# revoke the tokens they are sent, or a new session of a user of its own
+# before every request for routes that end sessions
+SESSION, TOKEN, FRESH_TOKEN, FRESH_SESSION = None, 'token', 'fresh token', 'fresh session'
+# events per request of the batch delete
+DELETE_BATCH = 10
+
+
+class Form(dict):
+    """
+    Body sent as HTML form data instead of JSON
+    """
+
+
+def requests_per_route(args):
+    return max(args.requests // args.threads, 1) * args.threads
+
+
+def add_targets(db_path, args):
+    """
+    Rows consumed by the write routes, one per request: active events
+    ending next year (joins, enrollments, deletes) and users without events
+    (deletes), numbered after the seeded ones
+    :return: dict of name -> first id, and the (event id, user id) of an enrollment for score updates
+    """
+    count = requests_per_route(args)
+    pools = {'api join': count, 'html join': count, 'enrollments': count, 'delete event': count,
+             'delete events': count * DELETE_BATCH}
+    begin_at = (datetime.date.today() + datetime.timedelta(days=360)).isoformat()
+    targets, rows, next_id = {}, [], args.events + 1
+    for name, size in pools.items():
+        targets[name] = next_id
+        rows.extend((id, f'Benchmark {name} {id}', 1, begin_at, begin_at, 10, True)
+                    for id in range(next_id, next_id + size))
+        next_id += size
+    targets['delete user'] = args.users + 1
+    connection = sqlite3.connect(db_path)
+    with connection:
+        connection.executemany('INSERT INTO event (id, description, created_by, begin_at, end_at, max_users, '
+                               'is_active) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        connection.executemany('INSERT INTO user (id, first_name, last_name, username, password) '
+                               'VALUES (?, ?, ?, ?, ?)',
+                               ((id, 'Delete', f'Me{id}', f'delete{id}', 'password')
+                                for id in range(args.users + 1, args.users + 1 + count)))
+        # a participant of the benchmark event if it has any
+        targets['scores'] = connection.execute('SELECT event_id, user_id FROM event_user '
+                                               'ORDER BY event_id != ?, id LIMIT 1',
+                                               (max(args.events // 2, 1),)).fetchone()
+    connection.close()
+    return targets
+
+
+def routes(args, targets):
+    """
+    (name, method, url, body, auth); url and body can be functions of
+    (n, tokens): n numbers the requests of a route from 0, tokens is the
+    login of a FRESH_TOKEN route
+    """
+    event_id = max(args.events // 2, 1)
+    user_id = max(args.users // 2, 1)
+    scores_event_id, scores_user_id = targets['scores'] or (event_id, 1)
+    today = datetime.date.today().isoformat()
+    next_week = (datetime.date.today() + datetime.timedelta(days=6)).isoformat()
+    # max_users of the seeded events is at most 100: updates never go below their participants
+    new_event = {'description': 'Benchmark event', 'begin_at': today, 'end_at': today, 'max_users': 100}
+    event_form = Form(new_event, is_active='y')
+    return [
+        ('main page', 'GET', '/', None, SESSION),
+        ('login form', 'GET', '/login/', None, SESSION),
+        ('login', 'POST', '/login/', Form(username='user1', password='password1'), SESSION),
+        ('register form', 'GET', '/register/', None, SESSION),
+        ('register', 'POST', '/register/',
+         lambda n, tokens: Form(first_name='Bench', last_name=f'Register{n}', username=f'register{n}',
+                                password='password'), SESSION),
+        ('logout', 'GET', '/logout/', None, FRESH_SESSION),
+        ('logout everywhere', 'GET', '/logout/all/', None, FRESH_SESSION),
+        ('events list', 'GET', '/events/?page=2&size=20', None, SESSION),
+        ('events list (cursor)', 'GET', '/events/?after=&size=20', None, SESSION),
+        ('event detail', 'GET', f'/events/{event_id}/', None, SESSION),
+        ('event users', 'GET', f'/events/{event_id}/users/', None, SESSION),
+        ('search', 'GET', '/search/?query=pyth', None, SESSION),
+        ('users list', 'GET', '/users/?page=2&size=20', None, SESSION),
+        ('feed created', 'GET', '/feed/created/', None, SESSION),
+        ('feed joined', 'GET', '/feed/joined/', None, SESSION),
+        ('feed joinable', 'GET', '/feed/joinable/', None, SESSION),
+        ('event leaderboard', 'GET', f'/events/{event_id}/leaderboard/', None, SESSION),
+        ('leaderboard', 'GET', '/leaderboard/', None, SESSION),
+        ('calendar month', 'GET', '/calendar/', None, SESSION),
+        ('calendar week', 'GET', f'/calendar/week/?date={today}', None, SESSION),
+        ('class users', 'GET', '/class/users/', None, SESSION),
+        ('class user detail', 'GET', f'/class/users/{user_id}/', None, SESSION),
+        ('class events', 'GET', '/class/events/', None, SESSION),
+        ('class event detail', 'GET', f'/class/events/{event_id}/', None, SESSION),
+        ('create form', 'GET', '/create/', None, SESSION),
+        ('create', 'POST', '/create/', event_form, SESSION),
+        ('update form', 'GET', f'/events/{event_id}/update/', None, SESSION),
+        ('update', 'POST', f'/events/{event_id}/update/', event_form, SESSION),
+        ('join', 'POST', lambda n, tokens: f'/events/{targets["html join"] + n}/users', None, SESSION),
+        ('api events', 'GET', '/api/events/?page=2&size=50', None, TOKEN),
+        ('api events (cursor)', 'GET', '/api/events/?after=&size=50', None, TOKEN),
+        ('api events (date range)', 'GET', f'/api/events/?from={today}&to={next_week}&after=&size=50', None, TOKEN),
+        ('api calendar', 'GET', '/api/calendar/', None, TOKEN),
+        ('api users', 'GET', '/api/users/?page=2&size=50', None, TOKEN),
+        ('api event users', 'GET', f'/api/events/{event_id}/users/', None, TOKEN),
+        ('api feed created', 'GET', '/api/feed/created/', None, TOKEN),
+        ('api feed joined', 'GET', '/api/feed/joined/', None, TOKEN),
+        ('api feed joinable', 'GET', '/api/feed/joinable/', None, TOKEN),
+        ('api event leaderboard', 'GET', f'/api/events/{event_id}/leaderboard/?user_id={user_id}', None, TOKEN),
+        ('api leaderboard', 'GET', f'/api/leaderboard/?user_id={user_id}', None, TOKEN),
+        ('api update scores', 'PATCH', f'/api/events/{scores_event_id}/scores/',
+         lambda n, tokens: [{'user_id': scores_user_id, 'score': n % 100}], TOKEN),
+        ('api export events', 'GET', '/api/export/events/', None, TOKEN),
+        ('api export users', 'GET', '/api/export/users/', None, TOKEN),
+        ('api export event users', 'GET', f'/api/export/events/{event_id}/users/', None, TOKEN),
+        ('api create event', 'POST', '/api/events/', new_event, TOKEN),
+        ('api update event', 'PATCH', f'/api/events/{event_id}/', {'max_users': 100}, TOKEN),
+        ('api update events', 'PATCH', '/api/events/',
+         [{'id': id, 'max_users': 100} for id in range(event_id, event_id + 10)], TOKEN),
+        ('api join event', 'POST', lambda n, tokens: f'/api/events/{targets["api join"] + n}/users/', None, TOKEN),
+        ('api enroll', 'POST', '/api/enrollments/',
+         lambda n, tokens: {'event_id': targets['enrollments'] + n, 'user_id': 1, 'score': 5}, TOKEN),
+        ('api delete event', 'DELETE', lambda n, tokens: f'/api/events/{targets["delete event"] + n}/', None, TOKEN),
+        ('api delete events', 'DELETE', '/api/events/',
+         lambda n, tokens: list(range(targets['delete events'] + n * DELETE_BATCH,
+                                      targets['delete events'] + (n + 1) * DELETE_BATCH)), TOKEN),
+        ('api create user', 'POST', '/api/users/',
+         lambda n, tokens: {'first_name': 'Bench', 'last_name': f'User{n}', 'username': f'bench{n}',
+                            'password': 'password'}, TOKEN),
+        ('api edit users', 'PATCH', '/api/users/',
+         lambda n, tokens: [{'id': id, 'first_name': f'First{n}'} for id in range(user_id, user_id + 10)], TOKEN),
+        ('api update user', 'POST', f'/api/users/{user_id}/',
+         {'first_name': 'First', 'last_name': 'Last', 'username': f'user{user_id}', 'password': f'password{user_id}'},
+         TOKEN),
+        ('api edit user', 'PATCH', f'/api/users/{user_id}/', lambda n, tokens: {'first_name': f'First{n}'}, TOKEN),
+        ('api delete user', 'DELETE', lambda n, tokens: f'/api/users/{targets["delete user"] + n}/', None, TOKEN),
+        ('api login', 'POST', '/api/login/', {'username': 'user1', 'password': 'password1'}, SESSION),
+        ('api token refresh', 'POST', '/api/token/refresh/',
+         lambda n, tokens: {'refresh_token': tokens['refresh_token']}, FRESH_TOKEN),
+        ('api logout', 'POST', '/api/logout/', lambda n, tokens: {'refresh_token': tokens['refresh_token']},
+         FRESH_TOKEN),
+    ]
+
+
+class StatementCounter:
+    """
+    SQL statements of the current thread between start() and stop()
+    (streamed responses included, their rows are fetched while the body is read)
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self.local, 'active', False):
+            self.local.count += 1
+
+    def start(self):
+        self.local.count = 0
+        self.local.active = True
+
+    def stop(self):
+        self.local.active = False
+        return self.local.count
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def resolve(value, n, tokens):
+    return value(n, tokens) if callable(value) else value
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['username'] = f'user{user_id}'
+        session['user_id'] = user_id
+        session['full_name'] = f'First{user_id} Last{user_id}'
+
+
+def drive(app, token, route, args, counter):
+    name, method, url, body, auth = route
+    per_thread = max(args.requests // args.threads, 1)
+    numbers = itertools.count()
+    timings, statements, statuses = [], [], {}
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        log_in(client, 1)
+        local, local_statements = [], []
+        for _ in range(per_thread):
+            n = next(numbers)
+            tokens = None
+            headers = {'Authorization': token} if auth == TOKEN else {}
+            if auth == FRESH_TOKEN:
+                tokens = client.post('/api/login/', json={'username': 'user1', 'password': 'password1'}).json
+                headers = {'Authorization': 'Bearer ' + tokens['token']}
+            if auth == FRESH_SESSION:
+                # a user per request: /logout/all/ doesn't end the sessions of the other threads
+                log_in(client, n % args.users + 1)
+            data = resolve(body, n, tokens)
+            payload = {'data': data} if isinstance(data, Form) else {'json': data}
+            request_url = resolve(url, n, tokens)
+            counter.start()
+            start = time.perf_counter()
+            response = client.open(request_url, method=method, headers=headers, **payload)
+            response.get_data()
+            local.append(time.perf_counter() - start)
+            local_statements.append(counter.stop())
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        with lock:
+            timings.extend(local)
+            statements.extend(local_statements)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return timings, statements, statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--enrollments', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    parser.add_argument('--only', help='run routes whose name contains this text')
+    parser.add_argument('--replicas', type=int, default=0, help='SQLite read replicas (copies of the seeded database)')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file of a previous run to compare with')
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.config import DevelopmentConfig
+    from app.database import sync_sqlite_replicas
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+
+        class BenchmarkConfig(DevelopmentConfig):
+            DEBUG = False
+            SECRET_KEY = 'benchmark'
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+            PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+            CACHE_BACKEND = 'memory' if args.cache else 'null'
+            RATELIMIT_ENABLED = False
+            DATABASE_REPLICAS = [f'sqlite:///{os.path.join(tmp, f"replica{number}.sqlite3")}'
+                                 for number in range(args.replicas)]
+
+        app = create_app(BenchmarkConfig)
+        seed(db_path, args.users, args.events, args.enrollments)
+        targets = add_targets(db_path, args)
+        with app.app_context():
+            sync_sqlite_replicas()
+        token = app.test_client().post('/api/login/', json={'username': 'user1', 'password': 'password1'}).json
+        token = token['token']
+
+        counter = StatementCounter()
+        sqlalchemy.event.listen(sqlalchemy.engine.Engine, 'before_cursor_execute', counter)
+        for route in routes(args, targets):
+            if args.only and args.only not in route[0]:
+                continue
+            timings, statements, statuses, elapsed = drive(app, token, route, args, counter)
+            results[route[0]] = {
+                'p50_ms': percentile(timings, 0.50) * 1000,
+                'p95_ms': percentile(timings, 0.95) * 1000,
+                'p99_ms': percentile(timings, 0.99) * 1000,
+                'mean_ms': statistics.mean(timings) * 1000,
+                'req_per_s': len(timings) / elapsed,
+                'queries_per_request': statistics.mean(statements),
+                'statuses': statuses,
+            }
+        sqlalchemy.event.remove(sqlalchemy.engine.Engine, 'before_cursor_execute', counter)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['routes']
+    print(f'{"route":<26} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>9} {"queries":>8}  statuses')
+    for name, result in results.items():
+        queries = result['queries_per_request']
+        line = (f'{name:<26} {result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} {result["p99_ms"]:8.2f} '
+                f'{result["req_per_s"]:9.1f} {"-" if queries is None else f"{queries:.1f}":>8}  '
+                f'{result["statuses"]}')
+        if name in previous:
+            change = (result['p50_ms'] / previous[name]['p50_ms'] - 1) * 100
+            line += f'  p50 {change:+.1f}%'
+        print(line)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'revision': git_revision(), 'args': vars(args), 'routes': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import datetime
+import os
+import random
+import sqlite3
+
+
+def configure_environment(db_path):
+    """
+    Point the app at a benchmark database before `app` is imported
+    :param db_path: path to SQLite file
+    :return:
+    """
+    os.environ['DATABASE'] = f'sqlite:///{os.path.abspath(db_path)}'
+    os.environ.setdefault('PORT', '5000')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('RATELIMIT_ENABLED', 'False')
+
+
+def seed(db_path, users, events, enrollments, random_seed=0):
+    """
+    Fill an app database with generated users, events and enrollments.
+    Rows are written with executemany on a raw sqlite3 connection.
+    :param db_path: path to SQLite file with the app schema
+    :param users: number of users
+    :param events: number of events
+    :param enrollments: number of (user, event) bindings, at most the free places of the events
+    :param random_seed: int
+    :return:
+    """
+    rnd = random.Random(random_seed)
+    today = datetime.date.today()
+    connection = sqlite3.connect(db_path)
+    with connection:
+        connection.executemany(
+            'INSERT INTO user (id, first_name, last_name, username, password) VALUES (?, ?, ?, ?, ?)',
+            ((i, f'First{i}', f'Last{i}', f'user{i}', f'password{i}') for i in range(1, users + 1))
+        )
+        max_users = [rnd.randint(1, 100) for _ in range(events)]
+        rows = []
+        for i in range(1, events + 1):
+            begin_at = today + datetime.timedelta(days=rnd.randint(-1000, 300))
+            end_at = begin_at + datetime.timedelta(days=rnd.randint(0, 60))
+            rows.append([i, f'Event {i} {rnd.choice(WORDS)} {rnd.choice(WORDS)}', rnd.randint(1, users),
+                         begin_at.isoformat(), end_at.isoformat(), max_users[i - 1], rnd.random() < 0.8, 0])
+        # no event gets more participants than its max_users, as the join views guarantee
+        pairs = set()
+        enrollments = min(enrollments, sum(min(limit, users) for limit in max_users))
+        while len(pairs) < enrollments:
+            pair = (rnd.randint(1, users), rnd.randint(1, events))
+            row = rows[pair[1] - 1]
+            if pair not in pairs and row[7] < row[5]:
+                pairs.add(pair)
+                row[7] += 1
+        connection.executemany(
+            'INSERT INTO event (id, description, created_by, begin_at, end_at, max_users, is_active, '
+            'participants_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        connection.executemany(
+            'INSERT INTO event_user (user_id, event_id, created_at, score) VALUES (?, ?, ?, ?)',
+            ((user_id, event_id, today.isoformat(), rnd.randint(0, 100)) for user_id, event_id in pairs)
+        )
+        connection.execute('INSERT INTO user_score (user_id, total_score) '
+                           'SELECT user_id, sum(score) FROM event_user GROUP BY user_id')
+    connection.execute('ANALYZE')
+    connection.close()
+
+
+WORDS = ['python', 'meetup', 'conference', 'workshop', 'hackathon', 'training', 'lecture',
+         'party', 'tournament', 'webinar', 'flask', 'sqlite', 'berlin', 'paris', 'online']
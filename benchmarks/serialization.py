@@ -0,0 +1,77 @@
+"""
+Rows per second of an API list response: fetch + build + JSON encode.
+
+    orm+dict      ORM objects, a dict per row, Flask's default provider (the old path)
+    rows+json     Serializer projection of result tuples, JSONProvider (stdlib json)
+    rows+orjson   Serializer projection, OrjsonProvider (when orjson is installed)
+
+    python -m benchmarks.serialization --events 50000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.seed import configure_environment, seed
+
+
+def best_of(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        configure_environment(db_path)
+        from app import create_app, db
+        from app.event.models import Event
+        from app.event.serializers import EVENT
+        from app.serializers import JSONProvider, OrjsonProvider, orjson
+
+        app = create_app('development')
+        seed(db_path, 100, args.events, 0)
+
+        def orm_dict(provider):
+            events = db.session.execute(db.select(Event)).scalars().all()
+            context = [{
+                'id': item.id,
+                'description': item.description,
+                'created_by': item.created_by,
+                'begin_at': item.begin_at,
+                'end_at': item.end_at,
+                'max_users': item.max_users,
+                'is_active': item.is_active
+            } for item in events]
+            provider.dumps(context)
+            db.session.expunge_all()
+
+        def rows(provider):
+            fields = EVENT.fields()
+            provider.dumps(EVENT.dump(db.session.execute(EVENT.select(fields)), fields))
+
+        modes = [('orm+dict', orm_dict, DefaultJSONProvider(app)), ('rows+json', rows, JSONProvider(app))]
+        if orjson is not None:
+            modes.append(('rows+orjson', rows, OrjsonProvider(app)))
+        with app.app_context():
+            baseline = None
+            for name, run, provider in modes:
+                elapsed = best_of(args.repeat, lambda: run(provider))
+                rate = args.events / elapsed
+                baseline = baseline or rate
+                print(f'{name:<12} {rate:12,.0f} rows/s  {elapsed * 1000:8.1f} ms  x{rate / baseline:.2f}')
+
+
+if __name__ == '__main__':
+    main()
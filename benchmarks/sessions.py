@@ -0,0 +1,61 @@
+"""
+Session cost per request for each SESSION_STORE.
+
+    read      logged-in page that reads the session (GET /)
+    write     login: new session id and session data written
+    anonymous page without a session cookie (GET /)
+
+Prints requests per second and the size of the session cookie sent back by the client.
+
+    python -m benchmarks.sessions --requests 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.seed import configure_environment, seed
+
+STORES = ('cookie', 'memory', 'sql')
+SCENARIOS = ('read', 'write', 'anonymous')
+
+
+def rate(requests, send):
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = send()
+        response.close()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        configure_environment(db_path)
+        # keep password hashing out of the login numbers
+        os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1'
+        from app import create_app
+
+        print(f'{"store":<8} {"cookie bytes":>12} ' + ' '.join(f'{name + " req/s":>16}' for name in SCENARIOS))
+        for store in STORES:
+            os.environ['SESSION_STORE'] = store
+            app = create_app('development')
+            if store == STORES[0]:
+                seed(db_path, 10, 0, 0)
+            client, anonymous = app.test_client(), app.test_client(use_cookies=False)
+            client.post('/login/', data={'username': 'user1', 'password': 'password1'})
+            cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+            rates = [
+                rate(args.requests, lambda: client.get('/')),
+                rate(args.requests, lambda: client.post('/login/', data={'username': 'user1', 'password': 'password1'})),
+                rate(args.requests, lambda: anonymous.get('/')),
+            ]
+            print(f'{store:<8} {len(cookie.value):>12} ' + ' '.join(f'{value:>16,.0f}' for value in rates))
+
+
+if __name__ == '__main__':
+    main()
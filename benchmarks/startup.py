@@ -0,0 +1,58 @@
+"""
+Worker boot time: package import, create_app() and the first request,
+each measured in a fresh interpreter.
+
+    python -m benchmarks.startup --runs 10 --config production
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.seed import configure_environment
+
+WORKER = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({config!r})
+created = time.perf_counter()
+response = app.test_client().get('/login/')
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - start}}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default='production', help='name from app.config.CONFIGS')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(os.path.join(tmp, 'bench.sqlite3'))
+        # the schema a deployed worker starts with (the first request may write a session)
+        from app import create_app, db
+        app = create_app(args.config)
+        with app.app_context():
+            db.create_all()
+            db.engine.dispose()
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, '-c', WORKER.format(config=args.config)],
+                                    check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        values = [run[phase] * 1000 for run in runs]
+        print(f'{phase:>14}: median {statistics.median(values):7.1f} ms  max {max(values):7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
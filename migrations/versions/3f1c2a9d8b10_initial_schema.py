@@ -0,0 +1,67 @@
+"""initial schema
+
+Baseline of the tables previously created by db.create_all().
+Tables that already exist are left untouched, so databases created
+before migrations were introduced can be upgraded in place.
+
+Revision ID: 3f1c2a9d8b10
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    if 'user' not in existing:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('first_name', sa.String(length=50), nullable=False),
+            sa.Column('last_name', sa.String(length=50), nullable=False),
+            sa.Column('username', sa.String(length=50), nullable=False),
+            sa.Column('password', sa.String(length=50), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username')
+        )
+    if 'event' not in existing:
+        op.create_table(
+            'event',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('description', sa.String(), nullable=False),
+            sa.Column('created_by', sa.Integer(), nullable=False),
+            sa.Column('begin_at', sa.Date(), nullable=False),
+            sa.Column('end_at', sa.Date(), nullable=False),
+            sa.Column('max_users', sa.Integer(), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=False),
+            sa.ForeignKeyConstraint(['created_by'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'event_user' not in existing:
+        op.create_table(
+            'event_user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('event_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.Date(), nullable=False),
+            sa.Column('score', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['event_id'], ['event.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'event_id', name='_column1_column2_uc')
+        )
+
+
+def downgrade():
+    op.drop_table('event_user')
+    op.drop_table('event')
+    op.drop_table('user')
@@ -0,0 +1,45 @@
+"""add leaderboards
+
+Index on event_user (event_id, score) for per-event standings (it replaces
+the event_id index, which is its prefix) and the user_score table with
+every user's total score for the global standings.
+
+Revision ID: 4d7a2e9c5b18
+Revises: 9e6b1d4c7f52
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d7a2e9c5b18'
+down_revision = '9e6b1d4c7f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('UPDATE event_user SET score = 0 WHERE score IS NULL')
+    with op.batch_alter_table('event_user') as batch_op:
+        batch_op.alter_column('score', existing_type=sa.Integer(), server_default='0')
+    op.create_index('ix_event_user_event_id_score', 'event_user', ['event_id', 'score'], unique=False)
+    op.drop_index('ix_event_user_event_id', table_name='event_user', if_exists=True)
+    op.create_table('user_score',
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('total_score', sa.Integer(), nullable=False, server_default='0'),
+                    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+                    sa.PrimaryKeyConstraint('user_id'))
+    op.create_index('ix_user_score_total_score', 'user_score', ['total_score'], unique=False)
+    op.execute('INSERT INTO user_score (user_id, total_score) '
+               'SELECT user_id, sum(score) FROM event_user GROUP BY user_id')
+
+
+def downgrade():
+    op.drop_index('ix_user_score_total_score', table_name='user_score')
+    op.drop_table('user_score')
+    op.create_index('ix_event_user_event_id', 'event_user', ['event_id'], unique=False)
+    op.drop_index('ix_event_user_event_id_score', table_name='event_user')
+    with op.batch_alter_table('event_user') as batch_op:
+        batch_op.alter_column('score', existing_type=sa.Integer(), server_default=None)
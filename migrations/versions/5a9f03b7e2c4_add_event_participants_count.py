@@ -0,0 +1,31 @@
+"""add event participants count
+
+Counter of event_user rows per event, maintained by the enrollment service
+so capacity can be enforced with a single conditional UPDATE.
+
+Revision ID: 5a9f03b7e2c4
+Revises: c2d8e61f4a37
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9f03b7e2c4'
+down_revision = 'c2d8e61f4a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event') as batch_op:
+        batch_op.add_column(sa.Column('participants_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute('UPDATE event SET participants_count = '
+               '(SELECT count(*) FROM event_user WHERE event_user.event_id = event.id)')
+
+
+def downgrade():
+    with op.batch_alter_table('event') as batch_op:
+        batch_op.drop_column('participants_count')
@@ -0,0 +1,31 @@
+"""add event indexes
+
+event_user.event_id was only the second column of the (user_id, event_id)
+unique constraint, so lookups of an event's participants scanned the table.
+
+Revision ID: 7b4e5d2c1a09
+Revises: 3f1c2a9d8b10
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4e5d2c1a09'
+down_revision = '3f1c2a9d8b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_event_user_event_id', 'event_user', ['event_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_event_created_by', 'event', ['created_by'], unique=False, if_not_exists=True)
+    op.create_index('ix_event_is_active_end_at', 'event', ['is_active', 'end_at'], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_event_is_active_end_at', table_name='event', if_exists=True)
+    op.drop_index('ix_event_created_by', table_name='event', if_exists=True)
+    op.drop_index('ix_event_user_event_id', table_name='event_user', if_exists=True)
@@ -0,0 +1,28 @@
+"""add event search index
+
+FTS5 index over event descriptions with sync triggers (SQLite only),
+the same objects app/event/search.py creates with db.create_all().
+
+Revision ID: 9e6b1d4c7f52
+Revises: 5a9f03b7e2c4
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9e6b1d4c7f52'
+down_revision = '5a9f03b7e2c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.event.search import create_search_index
+    create_search_index(None, op.get_bind())
+
+
+def downgrade():
+    from app.event.search import drop_search_index
+    drop_search_index(None, op.get_bind())
@@ -0,0 +1,53 @@
+"""autoincrement event ids
+
+event and event_user become AUTOINCREMENT tables (SQLite): without it a new
+row takes the largest id + 1, so ids freed by deleting the newest rows (bulk
+deletes, the archive-events job) are handed out again and clash with the
+rows copied to event_archive / event_user_archive under the same ids.
+The id counters start after the largest id of the hot and archive tables.
+
+Revision ID: a8c5e2f71d34
+Revises: f4b2d9e6a713
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c5e2f71d34'
+down_revision = 'f4b2d9e6a713'
+branch_labels = None
+depends_on = None
+
+TABLES = (('event', 'event_archive'), ('event_user', 'event_user_archive'))
+
+
+def _recreate(autoincrement):
+    from app.event.calendar import create_duration_index
+    from app.event.search import create_search_index
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        # serial/identity sequences never reuse ids
+        return
+    table_kwargs = {'sqlite_autoincrement': True} if autoincrement else {}
+    for name, _ in TABLES:
+        with op.batch_alter_table(name, recreate='always', table_kwargs=table_kwargs):
+            pass
+    # the copy leaves out what batch mode can't reflect: search index triggers, expression index
+    create_search_index(None, bind)
+    create_duration_index(None, bind)
+    if autoincrement:
+        for name, archive in TABLES:
+            op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{name}'")
+            op.execute(f"INSERT INTO sqlite_sequence (name, seq) VALUES ('{name}', max("
+                       f"(SELECT coalesce(max(id), 0) FROM {name}), "
+                       f"(SELECT coalesce(max(id), 0) FROM {archive})))")
+
+
+def upgrade():
+    _recreate(autoincrement=True)
+
+
+def downgrade():
+    _recreate(autoincrement=False)
@@ -0,0 +1,35 @@
+"""add user sessions
+
+user_session table of the server-side session store (SESSION_STORE = 'sql').
+
+Revision ID: b6c3f8a1d290
+Revises: 4d7a2e9c5b18
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6c3f8a1d290'
+down_revision = '4d7a2e9c5b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_session',
+                    sa.Column('id', sa.String(length=64), nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=True),
+                    sa.Column('data', sa.Text(), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_user_session_user_id', 'user_session', ['user_id'], unique=False)
+    op.create_index('ix_user_session_expires_at', 'user_session', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_session_expires_at', table_name='user_session')
+    op.drop_index('ix_user_session_user_id', table_name='user_session')
+    op.drop_table('user_session')
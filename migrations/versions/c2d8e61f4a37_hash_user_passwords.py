@@ -0,0 +1,41 @@
+"""hash user passwords
+
+Widen user.password for salted hashes and hash passwords stored as plain text.
+
+Revision ID: c2d8e61f4a37
+Revises: 7b4e5d2c1a09
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d8e61f4a37'
+down_revision = '7b4e5d2c1a09'
+branch_labels = None
+depends_on = None
+
+user = sa.table('user', sa.column('id', sa.Integer), sa.column('password', sa.String))
+
+
+def upgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=50), type_=sa.String(length=255),
+                              existing_nullable=False)
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(user.c.id, user.c.password)).all()
+    for id, password in rows:
+        if '$' in password and password.startswith(('scrypt:', 'pbkdf2:')):
+            continue
+        connection.execute(user.update().where(user.c.id == id)
+                           .values(password=generate_password_hash(password)))
+
+
+def downgrade():
+    # hashes can't be turned back into passwords, only the column type is restored
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=255), type_=sa.String(length=50),
+                              existing_nullable=False)
@@ -0,0 +1,31 @@
+"""add revoked tokens
+
+revoked_token table of the shared JWT revocation store (JWT_REVOCATION_STORE = 'sql').
+
+Revision ID: d5e9a3c7b412
+Revises: a8c5e2f71d34
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e9a3c7b412'
+down_revision = 'a8c5e2f71d34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_token',
+                    sa.Column('jti', sa.String(length=32), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('jti'))
+    op.create_index('ix_revoked_token_expires_at', 'revoked_token', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_revoked_token_expires_at', table_name='revoked_token')
+    op.drop_table('revoked_token')
@@ -0,0 +1,31 @@
+"""add event calendar indexes
+
+(begin_at, end_at) index for date-range queries and the expression index
+on the event duration (SQLite only) app/event/calendar.py creates with
+db.create_all().
+
+Revision ID: e1a7c4b93f06
+Revises: b6c3f8a1d290
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a7c4b93f06'
+down_revision = 'b6c3f8a1d290'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.event.calendar import create_duration_index
+    op.create_index('ix_event_begin_at_end_at', 'event', ['begin_at', 'end_at'], unique=False)
+    create_duration_index(None, op.get_bind())
+
+
+def downgrade():
+    from app.event.calendar import drop_duration_index
+    drop_duration_index(None, op.get_bind())
+    op.drop_index('ix_event_begin_at_end_at', table_name='event')
@@ -0,0 +1,50 @@
+"""add event archive
+
+event_archive and event_user_archive tables: finished events and their
+enrollments moved out of the hot tables by the archive-events job.
+
+Revision ID: f4b2d9e6a713
+Revises: e1a7c4b93f06
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b2d9e6a713'
+down_revision = 'e1a7c4b93f06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_archive',
+                    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+                    sa.Column('description', sa.String(), nullable=False),
+                    sa.Column('created_by', sa.Integer(), nullable=False),
+                    sa.Column('begin_at', sa.Date(), nullable=False),
+                    sa.Column('end_at', sa.Date(), nullable=False),
+                    sa.Column('max_users', sa.Integer(), nullable=False),
+                    sa.Column('is_active', sa.Boolean(), nullable=False),
+                    sa.Column('participants_count', sa.Integer(), server_default='0', nullable=False),
+                    sa.ForeignKeyConstraint(['created_by'], ['user.id']),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_table('event_user_archive',
+                    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('event_id', sa.Integer(), nullable=False),
+                    sa.Column('created_at', sa.Date(), nullable=False),
+                    sa.Column('score', sa.Integer(), server_default='0', nullable=True),
+                    sa.ForeignKeyConstraint(['event_id'], ['event_archive.id']),
+                    sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_event_user_archive_event_id_user_id', 'event_user_archive', ['event_id', 'user_id'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_event_user_archive_event_id_user_id', table_name='event_user_archive')
+    op.drop_table('event_user_archive')
+    op.drop_table('event_archive')
@@ -0,0 +1,18 @@
+import pytest
+
+from app import create_app, db
+from app.config import TestingConfig
+
+
+class Config(TestingConfig):
+    # every request reaches the database
+    CACHE_BACKEND = 'null'
+
+
+@pytest.fixture
+def app():
+    app = create_app(Config)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
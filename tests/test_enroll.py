@@ -0,0 +1,82 @@
+import datetime
+import threading
+
+import pytest
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.event.models import Event, EventUser
+from app.user.models import User
+
+THREADS = 30
+CAPACITY = 10
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """
+    App on a database file: every thread gets its own connection, unlike the in-memory database
+    """
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.sqlite3"}'
+        CACHE_BACKEND = 'null'
+
+    app = create_app(Config)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def seed():
+    today = datetime.date.today()
+    db.session.add_all([User(first_name='First', last_name='Last', username=f'user{i}', password='password')
+                        for i in range(1, THREADS + 1)])
+    db.session.flush()
+    event = Event(description='Stress', created_by=1, begin_at=today, end_at=today + datetime.timedelta(days=1),
+                  max_users=CAPACITY, is_active=True, participants_count=0)
+    db.session.add(event)
+    db.session.commit()
+    return event.id
+
+
+def html_join(app, event_id, i):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = f'user{i}'
+        session['user_id'] = i
+    return lambda: client.post(f'/events/{event_id}/users')
+
+
+def api_join(app, event_id, i):
+    client = app.test_client()
+    token = client.post('/api/login/', json={'username': f'user{i}', 'password': 'password'}).json['token']
+    return lambda: client.post(f'/api/events/{event_id}/users/', headers={'Authorization': f'Bearer {token}'})
+
+
+@pytest.mark.parametrize('join', [html_join, api_join])
+def test_concurrent_joins_stay_within_max_users(file_app, join):
+    event_id = seed()
+    requests = [join(file_app, event_id, i) for i in range(1, THREADS + 1)]
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def run(request):
+        barrier.wait()
+        try:
+            request()
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=run, args=(request,)) for request in requests]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert not errors
+    db.session.expire_all()
+    event = db.session.get(Event, event_id)
+    rows = db.session.query(EventUser).filter_by(event_id=event_id).count()
+    assert event.participants_count <= event.max_users
+    assert event.participants_count == rows == CAPACITY
@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+import sqlalchemy
+
+from app import db
+from app.event.models import Event, EventUser
+from app.user.models import User
+
+PAGES = [
+    '/events/{event}/',
+    '/events/{event}/users/',
+    '/api/events/{event}/users/',
+    '/class/events/{event}/',
+    '/users/',
+    '/class/users/',
+    '/class/users/{user}/',
+]
+
+
+def seed(participants):
+    """
+    One event of the first user with `participants` enrolled users
+    :return: ids for the PAGES placeholders
+    """
+    today = datetime.date.today()
+    users = [User(first_name=f'First{i}', last_name=f'Last{i}', username=f'user{i}', password=f'password{i}')
+             for i in range(participants + 1)]
+    db.session.add_all(users)
+    db.session.flush()
+    event = Event(description='Meetup', created_by=users[0].id, begin_at=today, end_at=today,
+                  max_users=participants, is_active=True, participants_count=participants)
+    db.session.add(event)
+    db.session.flush()
+    db.session.add_all([EventUser(user_id=user.id, event_id=event.id, created_at=today) for user in users[1:]])
+    db.session.commit()
+    return {'event': event.id, 'user': users[1].id}
+
+
+def count_statements(app, participants):
+    """
+    :return: {page: number of SQL statements of one GET}
+    """
+    ids = seed(participants)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'user0'
+        session['user_id'] = 1
+        session['full_name'] = 'First0 Last0'
+    token = client.post('/api/login/', json={'username': 'user0', 'password': 'password0'}).json['token']
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    counts = {}
+    sqlalchemy.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for page in PAGES:
+            statements.clear()
+            response = client.get(page.format(**ids), headers={'Authorization': f'Bearer {token}'})
+            response.get_data()
+            assert response.status_code == 200, page
+            counts[page] = len(statements)
+    finally:
+        sqlalchemy.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return counts
+
+
+@pytest.mark.parametrize('participants', [10, 50])
+def test_statements_do_not_grow_with_participants(app, participants):
+    one = count_statements(app, 1)
+    db.drop_all()
+    db.create_all()
+    many = count_statements(app, participants)
+    assert many == one